@@ -0,0 +1,138 @@
+import os
+import pickle
+
+import pandas as pd
+
+from running_aggregates import SummaryCounts
+
+
+class AggregateState(SummaryCounts):
+    """Running aggregates for incremental runs
+
+    The SummaryCounts behind the summary sheets, plus each file's contribution
+    to them. update() applies only the contributions of files that were added,
+    changed or removed since the state was saved, so summaries never need the
+    full wide tables.
+
+    Value counts remember which file first gave each answer (files are merged in
+    sorted order) and are kept in that order, so ties come out in the same order
+    as value_counts().
+    """
+
+    def __init__(self, signature, demo_questions):
+        super().__init__(demo_questions)
+        self.signature = signature
+        self.files = {}
+        self.first_files = {}
+        self.question_presence = {}
+
+    @classmethod
+    def load(cls, state_file, signature, demo_questions):
+        """Load a saved state, or start empty if it is missing or was built differently"""
+        if os.path.exists(state_file):
+            try:
+                with open(state_file, 'rb') as f:
+                    state = pickle.load(f)
+                if isinstance(state, cls) and state.signature == signature:
+                    return state
+                print("  Aggregate state is from a different parser/configuration, rebuilding")
+            except Exception as e:
+                print(f"  Ignoring unreadable aggregate state {state_file}: {e}")
+        return cls(signature, demo_questions)
+
+    def save(self, state_file):
+        """Write the state atomically"""
+        tmp_file = state_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, state_file)
+
+    # ===== File contributions =====
+    def _counted_answers(self, contribution):
+        """(counter, value counts, answer) for every counted answer of a file's contribution"""
+        for key, value in contribution['demo'].items():
+            yield ('demo', key), self.demo_counts[key], value
+        for q_num, (_, response) in contribution['usability'].items():
+            if response is not None and pd.notna(response):
+                yield ('response', q_num), self.response_counts[q_num], response
+
+    @staticmethod
+    def _answer(contribution, counter):
+        kind, key = counter
+        if kind == 'demo':
+            return contribution['demo'].get(key)
+        return contribution['usability'].get(key, (None, None))[1]
+
+    def _add_file(self, file_name, fingerprint, demo_dict, usability_dict, cleaners):
+        demo, usability = self.count(demo_dict, usability_dict, cleaners)
+        contribution = {'fingerprint': fingerprint, 'demo': demo, 'usability': usability}
+        for q_num in usability:
+            self.question_presence[q_num] = self.question_presence.get(q_num, 0) + 1
+        for counter, _, value in self._counted_answers(contribution):
+            first = self.first_files.setdefault(counter, {})
+            first[value] = min(first.get(value, file_name), file_name)
+        self.files[file_name] = contribution
+
+    def _remove_file(self, file_name):
+        contribution = self.files.pop(file_name)
+        self.participants -= 1
+
+        for counter, counts, value in self._counted_answers(contribution):
+            first = self.first_files[counter]
+            counts[value] -= 1
+            if counts[value] == 0:
+                del counts[value]
+                del first[value]
+            elif first[value] == file_name:
+                # The first file to give this answer is gone: find the next one
+                first[value] = min(f for f, other in self.files.items() if self._answer(other, counter) == value)
+
+        for q_num, (value, _) in contribution['usability'].items():
+            if value is not None and pd.notna(value):
+                self.score_hist[q_num][int(value)] -= 1
+            self.question_presence[q_num] -= 1
+            if self.question_presence[q_num] == 0:
+                del self.question_presence[q_num]
+                del self.score_hist[q_num]
+                del self.response_counts[q_num]
+
+    def _order_by_first_file(self):
+        """Put every value count in order of the first file that gave the answer"""
+        for (kind, key), first in self.first_files.items():
+            counts = self.demo_counts[key] if kind == 'demo' else self.response_counts.get(key)
+            if counts:
+                ordered = sorted(counts.items(), key=lambda item: first[item[0]])
+                counts.clear()
+                counts.update(ordered)
+
+    def update(self, input_dir, demographics_data, usability_data, cleaners):
+        """Apply the difference between the saved participants and this run's files
+
+        demographics_data and usability_data are the aligned per-participant
+        dicts of this run; cleaners is the compiled cleaning rules table
+        ({question key: (name, Normalizer)}). Only files whose size or mtime differs from the saved
+        fingerprint are (re)counted. Returns (added_or_changed, removed).
+        """
+        current = {}
+        for demo_dict, usability_dict in zip(demographics_data, usability_data):
+            file_name = f"{demo_dict['Participant']}.xlsx"
+            current[file_name] = (demo_dict, usability_dict)
+
+        removed = [f for f in self.files if f not in current]
+        for file_name in removed:
+            self._remove_file(file_name)
+
+        changed = 0
+        for file_name, (demo_dict, usability_dict) in current.items():
+            stat = os.stat(os.path.join(input_dir, file_name))
+            fingerprint = (stat.st_size, stat.st_mtime_ns)
+            previous = self.files.get(file_name)
+            if previous is not None and previous['fingerprint'] == fingerprint:
+                continue
+            if previous is not None:
+                self._remove_file(file_name)
+            self._add_file(file_name, fingerprint, demo_dict, usability_dict, cleaners)
+            changed += 1
+
+        self._order_by_first_file()
+        return changed, len(removed)
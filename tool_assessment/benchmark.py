@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_workbooks import generate_workbooks
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE = os.path.join(SCRIPT_DIR, 'merge_with_excel_charts_updated.py')
+
+# Named benchmark scales (any integer file count works too)
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000}
+
+# A run more than this much slower than the previous one at the same scale is flagged
+REGRESSION_THRESHOLD = 1.10
+
+
+def parse_scale(text):
+    """'10k' or '2500' -> number of files"""
+    return SCALES[text] if text in SCALES else int(text)
+
+
+def git_revision():
+    """Short commit hash of the working tree (with '+dirty' for local changes), or None outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '.'], cwd=SCRIPT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+dirty' if dirty else '')
+
+
+def prepare_data(data_dir, count, seed, workers, padded):
+    """Generate count synthetic workbooks in data_dir, reusing a matching earlier set"""
+    marker = os.path.join(data_dir, '.synthetic.json')
+    spec = {'count': count, 'seed': seed, 'padded': padded}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == spec:
+                print(f"  Reusing {count} synthetic workbooks in {data_dir}")
+                return
+    shutil.rmtree(data_dir, ignore_errors=True)
+    start = time.perf_counter()
+    generate_workbooks(data_dir, count, seed=seed, workers=workers, padded=padded)
+    with open(marker, 'w') as f:
+        json.dump(spec, f)
+    print(f"  Generated {count} synthetic workbooks in {time.perf_counter() - start:.1f}s")
+
+
+def run_pass(data_dir, name, count, pipeline_args):
+    """Run the pipeline once on data_dir and summarize its run report"""
+    report_file = os.path.join(data_dir, f'merged_data_run_report_{name}.json')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, PIPELINE, '--input-dir', data_dir, '--run-report', report_file, *pipeline_args],
+                   check=True, stdout=subprocess.DEVNULL)
+    wall = time.perf_counter() - start
+    with open(report_file) as f:
+        report = json.load(f)
+    return {
+        'pass': name,
+        'wall_s': round(wall, 3),
+        'files_per_s': round(count / wall, 1),
+        'peak_rss_mb': report['peak_rss_mb'],
+        'peak_rss_workers_mb': report['peak_rss_workers_mb'],
+        'files_parsed': report['files_parsed'],
+        'parse_p95_s': report['parse_latency_s']['p95'],
+        'stages': {stage['stage']: stage['wall_s'] for stage in report['stages']},
+    }
+
+
+def benchmark_scale(data_dir, count, args, pipeline_args):
+    """Cold run (empty extraction cache), then warm run (every file cached)"""
+    prepare_data(data_dir, count, args.seed, args.gen_workers, args.padded)
+    for state_file in ('.merge_cache.pkl', '.merge_state.pkl'):
+        if os.path.exists(os.path.join(data_dir, state_file)):
+            os.remove(os.path.join(data_dir, state_file))
+    pipeline_args = ['--workers', str(args.workers), *pipeline_args]
+    return [run_pass(data_dir, name, count, pipeline_args) for name in ('cold', 'warm')]
+
+
+def load_history(history_file):
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_pass(history, record, pass_name):
+    """The same pass of the latest earlier run with the same scale and settings"""
+    for earlier in reversed(history):
+        if all(earlier.get(key) == record[key] for key in ('files', 'workers', 'padded', 'pipeline_args')):
+            for result in earlier['passes']:
+                if result['pass'] == pass_name:
+                    return earlier, result
+    return None, None
+
+
+def print_results(record, history):
+    padded = ', padded' if record['padded'] else ''
+    print(f"\n{record['files']} files{padded}, {record['workers']} worker(s), commit {record['commit']}")
+    for result in record['passes']:
+        stages = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in result['stages'].items())
+        print(f"   {result['pass']:<5} {result['wall_s']:8.2f}s {result['files_per_s']:9.1f} files/s "
+              f"peak {result['peak_rss_mb']:.0f} MB (workers {result['peak_rss_workers_mb']:.0f} MB)")
+        print(f"         {stages}")
+        earlier, before = previous_pass(history, record, result['pass'])
+        if before is not None:
+            change = result['wall_s'] / before['wall_s']
+            flag = '  ⚠ slower' if change > REGRESSION_THRESHOLD else ''
+            print(f"         vs {earlier['commit']}: {change:.2f}x wall time, "
+                  f"{result['peak_rss_mb'] - before['peak_rss_mb']:+.0f} MB peak{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the merge pipeline on synthetic workbooks; '
+                    'unrecognized options are passed on to the pipeline (e.g. --streaming-output)')
+    parser.add_argument('--scale', action='append', default=None,
+                        help='number of files: 1k, 10k, 100k or any integer; repeat for several (default: 1k)')
+    parser.add_argument('--workers', type=int, default=1, help='pipeline --workers (default: 1)')
+    parser.add_argument('--gen-workers', type=int, default=os.cpu_count() or 1,
+                        help='processes used to generate the workbooks (default: all CPUs)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the generated workbooks')
+    parser.add_argument('--padded', action='store_true',
+                        help='generate workbooks padded to A1:Z1000 like the real exports (slower, more realistic)')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'tool_assessment_bench'),
+                        help='where the synthetic workbooks are kept between runs (one subdirectory per scale)')
+    parser.add_argument('--history', default=os.path.join(SCRIPT_DIR, 'benchmark_history.jsonl'),
+                        help='JSON-lines file the results are appended to and compared against')
+    args, pipeline_args = parser.parse_known_args()
+
+    history = load_history(args.history)
+    for scale in args.scale or ['1k']:
+        count = parse_scale(scale)
+        print(f"\n===== {count} files =====")
+        data_dir = os.path.join(args.data_dir, f"{count}_files{'_padded' if args.padded else ''}")
+        passes = benchmark_scale(data_dir, count, args, pipeline_args)
+        record = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_revision(),
+            'files': count,
+            'workers': args.workers,
+            'padded': args.padded,
+            'pipeline_args': pipeline_args,
+            'passes': passes,
+        }
+        print_results(record, history)
+        history.append(record)
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+    print(f"\n✓ Results appended to {args.history}")
+
+
+if __name__ == '__main__':
+    main()
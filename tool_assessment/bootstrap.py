@@ -0,0 +1,136 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from score_stats import SCORE_VALUES, histogram_quantile
+from spilled_table import SpilledTable
+
+# Resamples per batch are capped so a batch's (resample x participant) arrays stay around 32 MB
+BATCH_CELLS = 2**22
+
+
+def score_matrix(usability_wide, questions):
+    """Participant x question float matrix of the Qn_Score columns (NaN = no score)
+
+    usability_wide may be a SpilledTable, which is read a chunk at a time.
+    """
+    columns = [f'{q}_Score' for q in questions]
+    if isinstance(usability_wide, SpilledTable):
+        return np.concatenate([chunk[columns].to_numpy(dtype=float, na_value=np.nan)
+                               for chunk in usability_wide.chunks()] or [np.empty((0, len(columns)))])
+    return usability_wide[columns].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _one_hot(scores):
+    """(participant, question * score) indicator matrix of a score matrix"""
+    n_participants, n_questions = scores.shape
+    # float32 counts are exact up to 2**24 participants
+    one_hot = np.zeros((n_participants, n_questions, len(SCORE_VALUES)), dtype=np.float32)
+    rows, cols = np.nonzero(~np.isnan(scores))
+    one_hot[rows, cols, scores[rows, cols].astype(np.int64)] = 1
+    return one_hot.reshape(n_participants, n_questions * len(SCORE_VALUES))
+
+
+def _batch_medians(one_hot, n_questions, size, seed):
+    """Medians of every question in size resamples of the participants"""
+    n_participants = one_hot.shape[0]
+    rng = np.random.default_rng(seed)
+    # All resamples of the batch as one index array, turned into per-resample participant multiplicities
+    picks = rng.integers(0, n_participants, size=(size, n_participants))
+    picks += np.arange(size)[:, None] * n_participants
+    weights = np.bincount(picks.ravel(), minlength=size * n_participants).reshape(size, n_participants)
+    weights = weights.astype(np.float32)
+    # Score histogram of every (resample, question) in one matrix product
+    hist = (weights @ one_hot).reshape(size * n_questions, len(SCORE_VALUES))
+    return histogram_quantile(hist, 0.5).reshape(size, n_questions)
+
+
+# The one-hot matrix of a pool worker, set once by _init_worker so batches only carry (size, seed)
+_WORKER_ONE_HOT = None
+_WORKER_QUESTIONS = None
+
+
+def _init_worker(one_hot, n_questions):
+    global _WORKER_ONE_HOT, _WORKER_QUESTIONS
+    _WORKER_ONE_HOT, _WORKER_QUESTIONS = one_hot, n_questions
+
+
+def _worker_batch_medians(size, seed):
+    return _batch_medians(_WORKER_ONE_HOT, _WORKER_QUESTIONS, size, seed)
+
+
+def bootstrap_median_ci(scores, resamples=10000, level=0.95, seed=0, workers=1):
+    """Percentile bootstrap confidence interval of the median of every column of a score matrix
+
+    Resamples whole participants (rows) with replacement, so every resample
+    keeps the participant x question structure; a participant without a score
+    for a question is resampled as such. Resamples are drawn in batches of
+    index arrays and their medians come from histograms, so no per-resample
+    Python work is done. With workers > 1 the batches are spread over a
+    process pool, which gets the one-hot score matrix once per worker rather than
+    with every batch; each batch has its own seed (spawned from seed), so the result
+    does not depend on the number of workers. Returns (low, high) arrays, NaN
+    for questions without scores.
+    """
+    scores = np.asarray(scores, dtype=float)
+    n_participants, n_questions = scores.shape
+    if n_participants == 0 or resamples <= 0:
+        return np.full(n_questions, np.nan), np.full(n_questions, np.nan)
+
+    batch_size = max(1, min(resamples, BATCH_CELLS // n_participants))
+    sizes = [min(batch_size, resamples - start) for start in range(0, resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    one_hot = _one_hot(scores)
+
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(one_hot, n_questions)) as executor:
+            medians = list(executor.map(_worker_batch_medians, sizes, seeds))
+    else:
+        medians = [_batch_medians(one_hot, n_questions, size, batch_seed) for size, batch_seed in zip(sizes, seeds)]
+    return _percentile_interval(np.concatenate(medians), level)
+
+
+def histogram_median_ci(hist, participants, resamples=10000, level=0.95, seed=0):
+    """Percentile bootstrap confidence interval of the median of every question from its score histogram
+
+    hist is the (question x score) histogram of participants participants.
+    Resampling the participants and then looking at one question draws that
+    question's answers with replacement: a multinomial draw over its score
+    counts plus the participants without a score. Every question's resampled
+    medians, and so its interval, follow the same distribution as with
+    bootstrap_median_ci, but memory does not grow with the participants.
+    Returns (low, high) arrays, NaN for questions without scores.
+    """
+    hist = np.asarray(hist, dtype=np.int64).reshape(-1, len(SCORE_VALUES))
+    n_questions = hist.shape[0]
+    if participants == 0 or resamples <= 0 or n_questions == 0:
+        return np.full(n_questions, np.nan), np.full(n_questions, np.nan)
+
+    # Last category: participants without a score for the question
+    pvals = np.column_stack([hist, participants - hist.sum(axis=1)]) / participants
+    batch_size = max(1, min(resamples, BATCH_CELLS // pvals.size))
+    rng = np.random.default_rng(seed)
+    medians = []
+    for start in range(0, resamples, batch_size):
+        size = min(batch_size, resamples - start)
+        draws = rng.multinomial(participants, pvals, size=(size, n_questions))[:, :, :-1]
+        medians.append(histogram_quantile(draws.reshape(size * n_questions, len(SCORE_VALUES)), 0.5)
+                       .reshape(size, n_questions))
+    return _percentile_interval(np.concatenate(medians), level)
+
+
+def _percentile_interval(medians, level):
+    tail = (1 - level) / 2 * 100
+    with warnings.catch_warnings():
+        # Questions nobody scored have only NaN medians
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanpercentile(medians, [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def add_median_ci(usability_medians, low, high):
+    """usability_medians with the Median_CI_Low/Median_CI_High columns of an interval
+    from bootstrap_median_ci or histogram_median_ci (in the same question order)"""
+    return usability_medians.assign(Median_CI_Low=np.round(low, 2), Median_CI_High=np.round(high, 2))
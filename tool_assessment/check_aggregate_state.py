@@ -0,0 +1,135 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+import pandas as pd
+
+from aggregate_state import AggregateState
+from extraction import build_demographics_wide, build_usability_wide, response_mapping
+from merge_with_excel_charts_updated import DEMO_SUMMARY_QUESTIONS
+from normalizers import apply_cleaning_rules, load_cleaning_rules
+from score_stats import score_histogram, usability_medians_table
+from summaries import summarize_demographics, summarize_usability
+from synthetic_workbooks import DEMOGRAPHICS_ANSWERS, DEMOGRAPHICS_QUESTIONS
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CLEANING_RULES = os.path.join(SCRIPT_DIR, 'cleaning_rules.json')
+QUESTION_TEXTS = {f'Q{q_num}': f'Q{q_num}) Usability question {q_num}' for q_num in range(1, 19)}
+
+
+def random_participant(rng, name):
+    """(demo_dict, usability_dict) shaped like extract_participant's, for one random participant
+
+    Answers come from a few spellings per question, so after cleaning many
+    values tie on count; Q18 is sometimes missing altogether, so a question
+    can disappear from the run and come back.
+    """
+    demo_dict = {'Participant': name}
+    for question, choices in zip(DEMOGRAPHICS_QUESTIONS, DEMOGRAPHICS_ANSWERS):
+        demo_dict[question] = rng.choice(choices[:4]) if rng.random() > 0.1 else float('nan')
+    usability_dict = {'Participant': name}
+    for q_num in range(1, 19 if rng.random() > 0.2 else 18):
+        response = rng.choice(list(response_mapping)) if rng.random() > 0.1 else None
+        usability_dict[f'Q{q_num}_Score'] = response_mapping.get(response)
+        usability_dict[f'Q{q_num}_Response'] = response
+    return demo_dict, usability_dict
+
+
+def reference_summaries(participants, cleaners):
+    """(Demo_Summary, Usability_Summary, Usability_Medians) as a full run builds them from the wide tables
+
+    participants maps file name -> (demo_dict, usability_dict); files are
+    merged in file name order, as the pipeline does.
+    """
+    names = sorted(participants)
+    demographics_wide = build_demographics_wide([participants[name][0] for name in names])
+    apply_cleaning_rules(demographics_wide, cleaners)
+    usability_wide = build_usability_wide([participants[name][1] for name in names])
+    questions = [f'Q{q_num}' for q_num in range(1, 19) if f'Q{q_num}_Score' in usability_wide.columns]
+    return (summarize_demographics(demographics_wide, DEMO_SUMMARY_QUESTIONS),
+            summarize_usability(usability_wide, QUESTION_TEXTS),
+            usability_medians_table(score_histogram(usability_wide, questions), questions, QUESTION_TEXTS))
+
+
+def frame_difference(name, expected, actual):
+    """None if the tables hold the same rows in the same order, else a description of the difference"""
+    try:
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+    except AssertionError as e:
+        return f"{name} differs:\n{e}\nexpected:\n{expected}\nactual:\n{actual}"
+    return None
+
+
+def write_stub(input_dir, name, version):
+    """A stand-in workbook whose size changes with every version (only its size and mtime are read)"""
+    with open(os.path.join(input_dir, f'{name}.xlsx'), 'wb') as f:
+        f.write(b'x' * version)
+
+
+def random_changes(rng, names, live, versions, input_dir):
+    """Add, change or remove one to three participants; returns what was done"""
+    done = []
+    for _ in range(rng.randint(1, 3)):
+        absent = [name for name in names if name not in live]
+        roll = rng.random()
+        if absent and (not live or roll < 0.45):
+            name, action = rng.choice(absent), 'add'
+        elif len(live) > 1 and roll < 0.75:
+            name, action = rng.choice(sorted(live)), 'remove'
+        else:
+            name, action = rng.choice(sorted(live)), 'change'
+        if action == 'remove':
+            del live[name]
+            os.remove(os.path.join(input_dir, f'{name}.xlsx'))
+        else:
+            live[name] = random_participant(rng, name)
+            versions[name] = versions.get(name, 0) + 1
+            write_stub(input_dir, name, versions[name])
+        done.append(f'{action} {name}')
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Regression check of --incremental: apply random additions, changes and removals to an '
+                    'AggregateState (saved and reloaded every step) and compare its summary sheets, row order '
+                    'included, with the ones a full run builds from the same participants')
+    parser.add_argument('--steps', type=int, default=300, help='number of update steps (default: 300)')
+    parser.add_argument('--participants', type=int, default=12,
+                        help='size of the participant pool; small pools tie more often (default: 12)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cleaners = load_cleaning_rules(CLEANING_RULES)
+    names = [f'P{idx:03d}' for idx in range(args.participants)]
+    live = {}
+    versions = {}
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        state_file = os.path.join(input_dir, '.merge_state.pkl')
+        for step in range(1, args.steps + 1):
+            done = random_changes(rng, names, live, versions, input_dir)
+            state = AggregateState.load(state_file, ('check',), DEMO_SUMMARY_QUESTIONS)
+            participants = [live[name] for name in sorted(live)]
+            state.update(input_dir, [demo for demo, _ in participants], [usability for _, usability in participants],
+                         cleaners)
+            state.save(state_file)
+
+            expected = reference_summaries({f'{name}.xlsx': live[name] for name in live}, cleaners)
+            actual = (state.demographics_summary(), state.usability_summary(QUESTION_TEXTS),
+                      state.usability_medians(QUESTION_TEXTS))
+            for sheet, expected_table, actual_table in zip(
+                    ['Demo_Summary', 'Usability_Summary', 'Usability_Medians'], expected, actual):
+                difference = frame_difference(sheet, expected_table, actual_table)
+                if difference is not None:
+                    sys.exit(f"Step {step} ({', '.join(done)}): {difference}")
+
+    print(f"✓ {args.steps} incremental updates match a full rebuild (seed {args.seed})")
+
+
+if __name__ == '__main__':
+    main()
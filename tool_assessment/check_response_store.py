@@ -0,0 +1,93 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from check_aggregate_state import (CLEANING_RULES, QUESTION_TEXTS, frame_difference, random_changes,
+                                   reference_summaries)
+from extraction import build_usability_wide
+from merge_with_excel_charts_updated import DEMO_SUMMARY_QUESTIONS
+from normalizers import load_cleaning_rules
+from response_store import ResponseStore
+
+
+def pandas_quantiles(participants):
+    """Usability_Medians' score columns straight from Series.quantile, which the usability_medians view re-implements"""
+    usability_wide = build_usability_wide([participants[name][1] for name in sorted(participants)])
+    rows = []
+    for q_num in range(1, 19):
+        if f'Q{q_num}_Score' not in usability_wide.columns:
+            continue
+        scores = usability_wide[f'Q{q_num}_Score'].dropna().astype(float)
+        rows.append({
+            'Question_Number': f'Q{q_num}',
+            'Median_Score': round(scores.quantile(0.5), 2),
+            'Responses': len(scores),
+            'P25_Score': round(scores.quantile(0.25), 2),
+            'P75_Score': round(scores.quantile(0.75), 2),
+        })
+    return pd.DataFrame(rows)
+
+
+def store_difference(store, participants, cleaners):
+    """None if every summary view matches the pipeline's tables, else a description of the difference"""
+    demographics_summary, usability_summary, usability_medians = reference_summaries(participants, cleaners)
+    # SQLite hands back plain text, so compare the ordered Categorical responses as text
+    usability_summary['Response'] = usability_summary['Response'].astype(str)
+    views = {
+        'demo_summary': (store.query('SELECT * FROM demo_summary'), demographics_summary),
+        'usability_summary': (store.query('SELECT * FROM usability_summary'), usability_summary),
+        'usability_medians': (store.query('SELECT * FROM usability_medians'), usability_medians),
+    }
+    quantiles = pandas_quantiles(participants)
+    views['usability_medians (Series.quantile)'] = (views['usability_medians'][0][quantiles.columns], quantiles)
+    for name, (actual, expected) in views.items():
+        difference = frame_difference(name, expected, actual)
+        if difference is not None:
+            return difference
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Regression check of --response-store: upsert, change and remove random participants and '
+                    'compare the demo_summary, usability_summary and usability_medians views with the summary '
+                    'sheets a full run builds (and the quartiles with Series.quantile)')
+    parser.add_argument('--steps', type=int, default=200, help='number of update steps (default: 200)')
+    parser.add_argument('--participants', type=int, default=24,
+                        help='size of the participant pool (default: 24)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cleaners = load_cleaning_rules(CLEANING_RULES)
+    names = [f'P{idx:03d}' for idx in range(args.participants)]
+    live = {}
+    versions = {}
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        db_file = os.path.join(input_dir, 'merged_data_responses.sqlite')
+        for step in range(1, args.steps + 1):
+            done = random_changes(rng, names, live, versions, input_dir)
+            # Reopened every step, as every run opens it
+            store = ResponseStore(db_file, ('check',), cleaners, DEMO_SUMMARY_QUESTIONS)
+            for name in sorted(live):
+                demo_dict, usability_dict = live[name]
+                store.upsert(os.path.join(input_dir, f'{name}.xlsx'), demo_dict, usability_dict, QUESTION_TEXTS)
+            store.prune(sorted(live))
+
+            with np.errstate(all='ignore'):
+                difference = store_difference(store, {f'{name}.xlsx': live[name] for name in live}, cleaners)
+            store.close()
+            if difference is not None:
+                sys.exit(f"Step {step} ({', '.join(done)}): {difference}")
+
+    print(f"✓ {args.steps} response store updates match the summary sheets (seed {args.seed})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import os
+import re
+
+import pandas as pd
+
+from extraction import response_categories
+
+# Per-question Usability columns (Q1_Score, Q1_Response, ...)
+SCORE_COLUMN = re.compile(r'Q\d+_Score')
+RESPONSE_COLUMN = re.compile(r'Q\d+_Response')
+
+# File extension per supported format
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def _as_strings(series):
+    """Nullable string column (mixed free-text answers cannot be stored as object)"""
+    return series.map(lambda v: v if pd.isna(v) else str(v)).astype('string')
+
+
+def _typed_frame(df, response_dtype):
+    """Copy of df with storage dtypes: Int8 scores, categorical responses, strings elsewhere"""
+    typed = {}
+    for column in df.columns:
+        series = df[column]
+        name = str(column)
+        if SCORE_COLUMN.fullmatch(name):
+            typed[column] = series.astype('Int8')
+        elif (RESPONSE_COLUMN.fullmatch(name) or name == 'Response') and response_dtype is not None:
+            typed[column] = series.astype(response_dtype)
+        elif series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            typed[column] = _as_strings(series)
+        else:
+            typed[column] = series
+    return pd.DataFrame(typed, index=df.index)
+
+
+def answers_long(demographics_wide, usability_wide):
+    """One row per (participant, question) across both sheets"""
+    demo = demographics_wide.melt(id_vars='Participant', var_name='Question', value_name='Answer')
+    demo = demo.dropna(subset=['Answer'])
+    demo.insert(1, 'Sheet', 'Demographics')
+    demo['Score'] = pd.NA
+
+    score_cols = [c for c in usability_wide.columns if SCORE_COLUMN.fullmatch(str(c))]
+    scores = usability_wide.melt(id_vars='Participant', value_vars=score_cols,
+                                 var_name='Question', value_name='Score')
+    responses = usability_wide.melt(id_vars='Participant',
+                                    value_vars=[c[:-len('_Score')] + '_Response' for c in score_cols],
+                                    value_name='Answer')
+    usability = scores.assign(Answer=responses['Answer'].to_numpy())
+    usability['Question'] = usability['Question'].str[:-len('_Score')]
+    usability = usability.dropna(subset=['Answer', 'Score'], how='all')
+    usability.insert(1, 'Sheet', 'Usability')
+
+    long = pd.concat([demo, usability[demo.columns]], ignore_index=True)
+    return pd.DataFrame({
+        'Participant': long['Participant'].astype('string'),
+        'Sheet': long['Sheet'].astype('category'),
+        'Question': long['Question'].astype('category'),
+        'Answer': _as_strings(long['Answer']).astype('category'),
+        'Score': long['Score'].astype('Int8'),
+    })
+
+
+def export_columnar(output_dir, fmt, demographics_wide, usability_wide,
+                    demographics_summary, usability_summary, usability_medians):
+    """Write the wide tables, long answers and summaries as Parquet or Arrow IPC files
+
+    Needs pyarrow. Returns the paths written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    response_dtype = pd.CategoricalDtype(
+        response_categories(pd.unique(usability_wide.filter(like='_Response').to_numpy().ravel())),
+        ordered=True)
+
+    tables = {
+        'demographics_wide': _typed_frame(demographics_wide, None),
+        'usability_wide': _typed_frame(usability_wide, response_dtype),
+        'answers_long': answers_long(demographics_wide, usability_wide),
+        'demo_summary': _typed_frame(demographics_summary, None),
+        'usability_summary': _typed_frame(usability_summary, response_dtype),
+        'usability_medians': _typed_frame(usability_medians, None),
+    }
+
+    paths = []
+    for name, table in tables.items():
+        path = os.path.join(output_dir, name + COLUMNAR_FORMATS[fmt])
+        table = table.reset_index(drop=True)
+        if fmt == 'parquet':
+            table.to_parquet(path, index=False)
+        else:
+            table.to_feather(path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,391 @@
+import contextlib
+import functools
+import os
+import re
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from workbook_reader import read_participant_workbook
+
+# Bump whenever extract_participant output changes, so cached results are discarded
+PARSER_VERSION = 3
+
+QUESTION_NUMBER = re.compile(r'(Q\d+)\)')
+
+# Response mapping for Usability questions
+response_mapping = {
+    'Strongly Agree (5)': 5,
+    'Agree (4)': 4,
+    'Neutral (3)': 3,
+    'Disagree (2)': 2,
+    'Strongly Disagree (1)': 1,
+    'Not applicable': 0,
+    'Not applicable ': 0
+}
+
+# Display order of Usability responses (disagree -> agree, then Not applicable)
+RESPONSE_ORDER = ['Strongly Disagree (1)', 'Disagree (2)', 'Neutral (3)',
+                  'Agree (4)', 'Strongly Agree (5)', 'Not applicable', 'Not applicable ']
+
+
+def response_categories(values):
+    """RESPONSE_ORDER plus any other response texts found in values (appended in sorted order)"""
+    extra = sorted({v for v in values if isinstance(v, str) and v not in RESPONSE_ORDER})
+    return RESPONSE_ORDER + extra
+
+
+def response_dtype(values):
+    """Ordered Categorical dtype for Usability responses (see response_categories)"""
+    return pd.CategoricalDtype(response_categories(values), ordered=True)
+
+
+def is_participant_file(file_name):
+    """True for participant workbooks: .xlsx files other than our outputs and Office lock files (~$...)"""
+    return file_name.endswith('.xlsx') and not file_name.startswith(('merged_data', '~$'))
+
+
+def question_key(question):
+    """Key that identifies a demographics question across wording variants ('Q3) ...' -> 'Q3)')"""
+    q_match = QUESTION_NUMBER.match(question)
+    return q_match.group(0) if q_match else question
+
+
+def extract_usability_responses(df_usability, header_row=2, first_row=3, last_row=20):
+    """Detect the marked answer for every question row of a Usability sheet
+
+    Works on the whole response block (data rows first_row-last_row, answer
+    columns 1-6, with the answer headers in header_row) at once and returns (question_num, question_text, response_text, score) for each
+    row that starts with 'Qn)'. An 'x' in a cell wins; if there is none, or its
+    column header is not in response_mapping, the first '( )' cell is used.
+    """
+    headers = df_usability.iloc[header_row].tolist()
+    block = df_usability.iloc[first_row:last_row + 1]
+    if block.empty:
+        return []
+
+    question_col = block.iloc[:, 0].map(str).str.strip()
+    question_nums = question_col.str.extract(r'^(Q\d+)\)', expand=False)
+
+    # Answer headers and their scores, looked up once per sheet
+    n_answer_cols = min(7, block.shape[1]) - 1
+    header_texts = np.array([str(h).strip() for h in headers[1:1 + n_answer_cols]] + [None], dtype=object)
+    header_scores = np.array([response_mapping.get(h) for h in header_texts[:-1]] + [None], dtype=object)
+
+    cells = np.char.strip(block.iloc[:, 1:1 + n_answer_cols].to_numpy(dtype=object).astype(str))
+    x_marks = np.char.find(np.char.lower(cells), 'x') >= 0
+    empty_marks = (cells == '( )') | (cells == '()')
+
+    # First marked column per row; rows without a mark point at the trailing None
+    x_col = np.where(x_marks.any(axis=1), x_marks.argmax(axis=1), n_answer_cols)
+    empty_col = np.where(empty_marks.any(axis=1), empty_marks.argmax(axis=1), n_answer_cols)
+
+    x_scores = header_scores[x_col]
+    use_empty = pd.isna(x_scores) & (empty_col < n_answer_cols)
+    response_texts = np.where(use_empty, header_texts[empty_col], header_texts[x_col])
+    response_scores = np.where(use_empty, header_scores[empty_col], x_scores)
+
+    matched = question_nums.notna().to_numpy()
+    return list(zip(question_nums[matched], question_col[matched],
+                    response_texts[matched], response_scores[matched]))
+
+
+def extract_participant(file_path, timing=None):
+    """Extract (demo_dict, usability_dict, question_texts) from one participant workbook
+
+    If a timing dict is given, the seconds spent reading the workbook and
+    parsing its sheets are stored in it as 'read_s' and 'parse_s', and the
+    workbook's template fingerprint as 'template'.
+    """
+    participant_name = os.path.basename(file_path).replace('.xlsx', '')
+
+    # Open the workbook once and read only the cells we use from both sheets
+    read_start = time.perf_counter()
+    df_demo, df_usability, layout, fingerprint = read_participant_workbook(file_path)
+    parse_start = time.perf_counter()
+
+    # ===== Process Demographics Sheet =====
+    demo_dict = {'Participant': participant_name}
+    questions = [str(question).strip() for question in df_demo['Question'].tolist()]
+    demo_dict.update(zip(questions, df_demo['Answer'].tolist()))
+
+    # ===== Process Usability Sheet =====
+    usability_dict = {'Participant': participant_name}
+    question_texts = {}
+
+    for question_num, question_text, response_text, response_value in extract_usability_responses(
+            df_usability, layout.usability_header_row, layout.usability_first_row, layout.usability_last_row):
+        question_texts[question_num] = question_text
+        usability_dict[f'{question_num}_Score'] = response_value
+        usability_dict[f'{question_num}_Response'] = response_text
+
+    if timing is not None:
+        timing['read_s'] = round(parse_start - read_start, 4)
+        timing['parse_s'] = round(time.perf_counter() - parse_start, 4)
+        timing['template'] = fingerprint
+    return demo_dict, usability_dict, question_texts
+
+
+class ParseTimeout(Exception):
+    """A workbook took longer than the per-file time limit to parse"""
+
+
+@contextlib.contextmanager
+def _time_limit(seconds):
+    """Raise ParseTimeout if the block runs longer than seconds
+
+    Uses SIGALRM, so the limit is only enforced in the main thread of a process
+    (iter_extracted parses in worker processes when it is called from elsewhere).
+    """
+    if not seconds or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expired(signum, frame):
+        raise ParseTimeout(f'parsing took longer than {seconds:g}s')
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    # Keep firing every second after the deadline: an exception raised while a
+    # __del__ method runs is swallowed, so one alarm is not always enough
+    signal.setitimer(signal.ITIMER_REAL, seconds, 1.0)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _extract_or_error(file_path, timeout=None):
+    """Run extract_participant, returning (result, error message, timing) instead of raising
+
+    The result is all-or-nothing: a file that fails anywhere (or runs past
+    timeout seconds) contributes nothing.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    timing = {}
+    try:
+        with _time_limit(timeout):
+            result, error = extract_participant(file_path, timing), None
+    except Exception as e:
+        result, error = None, str(e) or type(e).__name__
+        # Libraries may turn the ParseTimeout into an error of their own, so any failure
+        # past the deadline counts as a timeout
+        if timeout and time.perf_counter() - wall_start >= timeout:
+            error = f'parsing took longer than {timeout:g}s'
+            timing['timed_out'] = True
+    timing['wall_s'] = round(time.perf_counter() - wall_start, 4)
+    timing['cpu_s'] = round(time.process_time() - cpu_start, 4)
+    return result, error, timing
+
+
+def iter_extracted(file_paths, workers=1, timeout=None):
+    """Yield (file_path, result, error, timing) for every file, in the order given
+
+    With workers > 1 the files are parsed in a process pool; results are still
+    yielded in input order so the merged output does not depend on scheduling.
+    A per-file timeout outside the main thread (e.g. in watch mode) also uses
+    the pool, because the time limit needs a process's main thread.
+    """
+    serial = workers <= 1 or len(file_paths) <= 1
+    if serial and (not timeout or threading.current_thread() is threading.main_thread()):
+        for file_path in file_paths:
+            yield (file_path, *_extract_or_error(file_path, timeout))
+        return
+
+    workers = max(1, workers)
+    chunksize = max(1, len(file_paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        outcomes = executor.map(functools.partial(_extract_or_error, timeout=timeout), file_paths,
+                                chunksize=chunksize)
+        for file_path, outcome in zip(file_paths, outcomes):
+            yield (file_path, *outcome)
+
+
+def ordered_question_keys(keys):
+    """Question keys (given in order of first appearance) in demographics_wide column order:
+    the numbered questions by number, then the rest as they appeared"""
+    numbered = sorted((key for key in keys if QUESTION_NUMBER.fullmatch(key)), key=lambda key: int(key[1:-1]))
+    return numbered + [key for key in keys if not QUESTION_NUMBER.fullmatch(key)]
+
+
+def build_demographics_wide(demographics_data):
+    """Pivot per-participant demographics dicts into one wide DataFrame
+
+    Collects (participant, question, answer) triples into preallocated arrays
+    and fills a participant x question matrix in a single assignment. Questions
+    are matched on their 'Qn)' number, so small wording differences between
+    template versions share one column (labelled with the first wording seen).
+    Columns are Participant, the numbered questions in order, then any other
+    rows in order of first appearance.
+    """
+    n_triples = sum(len(demo_dict) - 1 for demo_dict in demographics_data)
+    participant_idx = np.empty(n_triples, dtype=np.int64)
+    question_idx = np.empty(n_triples, dtype=np.int64)
+    answers = np.empty(n_triples, dtype=object)
+
+    participants = []
+    columns = {}
+    labels = []
+    pos = 0
+    for p_idx, demo_dict in enumerate(demographics_data):
+        participants.append(demo_dict['Participant'])
+        for question, answer in demo_dict.items():
+            if question == 'Participant':
+                continue
+            key = question_key(question)
+            q_idx = columns.get(key)
+            if q_idx is None:
+                q_idx = columns[key] = len(labels)
+                labels.append(question)
+            participant_idx[pos] = p_idx
+            question_idx[pos] = q_idx
+            answers[pos] = answer
+            pos += 1
+
+    matrix = np.full((len(participants), len(labels)), np.nan, dtype=object)
+    matrix[participant_idx, question_idx] = answers
+
+    order = [columns[key] for key in ordered_question_keys(columns)]
+
+    wide = {'Participant': pd.Series(participants, dtype=object).infer_objects()}
+    for q_idx in order:
+        wide[labels[q_idx]] = pd.Series(matrix[:, q_idx], dtype=object).infer_objects()
+    return pd.DataFrame(wide)
+
+
+def build_usability_wide(usability_data):
+    """Turn per-participant Usability dicts into a compact wide DataFrame
+
+    Qn_Score columns are nullable Int8 and all Qn_Response columns share one
+    ordered Categorical (RESPONSE_ORDER first), so each response is stored as
+    a one-byte code instead of a repeated string.
+    """
+    return with_usability_dtypes(pd.DataFrame(usability_data))
+
+
+def with_usability_dtypes(usability_wide):
+    """usability_wide with Int8 Qn_Score columns and one shared ordered Categorical for Qn_Response"""
+    score_cols = [c for c in usability_wide.columns if c.endswith('_Score')]
+    response_cols = [c for c in usability_wide.columns if c.endswith('_Response')]
+    dtype = response_dtype(pd.unique(usability_wide[response_cols].to_numpy(dtype=object).ravel()))
+    return usability_wide.astype({**{c: 'Int8' for c in score_cols}, **{c: dtype for c in response_cols}})
+
+
+def iter_participants(input_dir, excel_files, workers=1, cache=None, report=None,
+                      quarantine=None, max_bytes=None, timeout=None, store=None):
+    """Extract every workbook and yield the results one file at a time, in sorted file order
+
+    Yields (file_idx, demo_dict, usability_dict, question_texts) for every file
+    that parsed, where file_idx is its position in excel_files. Files with a
+    valid entry in cache (an ExtractionCache) are not opened at all. The parse
+    timing of every opened file is recorded in report (a RunReport), if given.
+
+    Files larger than max_bytes fail without being opened and files that take
+    longer than timeout seconds are abandoned, for this run only. Files that
+    fail to parse are added to quarantine (a Quarantine), if given, and skipped
+    while they stay unchanged.
+    Every participant is upserted into store (a ResponseStore), if given, and
+    participants without a parsed file are removed from it. Results are handed on as soon as they are parsed, so nothing is held for
+    more than one file unless the caller keeps it.
+    """
+    file_paths = [os.path.join(input_dir, file_name) for file_name in excel_files]
+
+    cached = {}
+    if cache is not None:
+        cache.prune(file_paths)
+        for file_path in file_paths:
+            result = cache.get(file_path)
+            if result is not None:
+                cached[file_path] = result
+
+    quarantined = {}
+    oversized = {}
+    to_parse = []
+    if quarantine is not None:
+        quarantine.prune(file_paths)
+    for file_path in file_paths:
+        if file_path in cached:
+            continue
+        error = quarantine.get(file_path) if quarantine is not None else None
+        if error is not None:
+            quarantined[file_path] = error
+        elif max_bytes and os.path.getsize(file_path) > max_bytes:
+            oversized[file_path] = (f'file is {os.path.getsize(file_path) / 2**20:.1f} MB, '
+                                    f'over the {max_bytes / 2**20:g} MB limit')
+        else:
+            to_parse.append(file_path)
+
+    # Parsed in to_parse order, which is file order without the cached/skipped files
+    extracted = iter_extracted(to_parse, workers, timeout)
+    participants = []
+
+    for file_idx, file_path in enumerate(file_paths):
+        if file_path in cached:
+            print(f"Processing: {os.path.basename(file_path)} (cached)")
+            result = cached[file_path]
+        elif file_path in quarantined:
+            print(f"Skipping: {os.path.basename(file_path)} (quarantined: {quarantined[file_path]})")
+            continue
+        else:
+            if file_path in oversized:
+                result, error, over_limit = None, oversized[file_path], True
+            else:
+                _, result, error, timing = next(extracted)
+                over_limit = timing.get('timed_out', False)
+                if report is not None:
+                    report.record_file(os.path.basename(file_path), timing, error)
+            print(f"Processing: {os.path.basename(file_path)}")
+            if error is not None:
+                print(f"  Error: {error}")
+                # Size and time limits depend on the settings and machine load, so they are not quarantined
+                if quarantine is not None and not over_limit:
+                    quarantine.add(file_path, error)
+                continue
+            if cache is not None:
+                cache.put(file_path, result)
+            if quarantine is not None:
+                quarantine.discard(file_path)
+
+        if store is not None:
+            store.upsert(file_path, *result)
+            participants.append(result[0]['Participant'])
+        yield (file_idx, *result)
+
+    if cache is not None:
+        cache.save()
+        print(f"\nExtraction cache: {cache.hits} hits, {cache.misses} misses")
+    if quarantine is not None:
+        quarantine.save()
+        print(f"Quarantine: {quarantine.skipped} skipped, {quarantine.added} newly quarantined, "
+              f"{len(quarantine.entries)} listed in {quarantine.quarantine_file}")
+    if store is not None:
+        removed = store.prune(participants)
+        print(f"Response store: {store.upserted} participants upserted, {removed} removed ({store.db_file})")
+
+
+def load_participants(input_dir, excel_files, workers=1, cache=None, report=None,
+                      quarantine=None, max_bytes=None, timeout=None, store=None):
+    """Extract every workbook and merge the results in sorted file order
+
+    Returns (demographics_data, usability_data, question_texts); question texts
+    come from the first file, as before. See iter_participants for the cache,
+    report, quarantine, limit and store arguments.
+    """
+    demographics_data = []
+    usability_data = []
+    question_texts = {}
+
+    for file_idx, demo_dict, usability_dict, file_question_texts in iter_participants(
+            input_dir, excel_files, workers, cache, report, quarantine, max_bytes, timeout, store):
+        demographics_data.append(demo_dict)
+        usability_data.append(usability_dict)
+
+        # Extract question texts from first file only
+        if file_idx == 0:
+            question_texts = file_question_texts
+
+    return demographics_data, usability_data, question_texts
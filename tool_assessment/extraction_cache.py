@@ -0,0 +1,100 @@
+import hashlib
+import os
+import pickle
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """On-disk cache of per-file extraction results
+
+    Entries are keyed by absolute path and validated against the file's size,
+    mtime and content hash. A cheap stat check is tried first; the file is only
+    hashed when its size or mtime changed (e.g. after a copy or a touch). The
+    whole cache is dropped when parser_version differs from the stored one.
+    """
+
+    def __init__(self, cache_file, parser_version):
+        self.cache_file = cache_file
+        self.parser_version = parser_version
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._hashes = {}
+        self._dirty = False
+
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    stored = pickle.load(f)
+            except Exception as e:
+                print(f"  Ignoring unreadable cache {cache_file}: {e}")
+                stored = None
+            if stored and stored.get('parser_version') == parser_version:
+                self.entries = stored['entries']
+            elif stored:
+                self._dirty = True
+
+    def _hash(self, file_path):
+        if file_path not in self._hashes:
+            self._hashes[file_path] = file_sha256(file_path)
+        return self._hashes[file_path]
+
+    def get(self, file_path):
+        """Return the cached result for file_path, or None if it must be re-parsed"""
+        key = os.path.abspath(file_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stat = os.stat(file_path)
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            self.hits += 1
+            return entry['result']
+
+        if entry['size'] == stat.st_size and entry['sha256'] == self._hash(file_path):
+            # Same content, new timestamp: refresh the stat fields only
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self._dirty = True
+            self.hits += 1
+            return entry['result']
+
+        self.misses += 1
+        return None
+
+    def put(self, file_path, result):
+        """Store the extraction result for file_path"""
+        stat = os.stat(file_path)
+        self.entries[os.path.abspath(file_path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': self._hash(file_path),
+            'result': result,
+        }
+        self._dirty = True
+
+    def prune(self, file_paths):
+        """Forget entries for files that are no longer part of the input"""
+        keep = {os.path.abspath(p) for p in file_paths}
+        for key in [k for k in self.entries if k not in keep]:
+            del self.entries[key]
+            self._dirty = True
+
+    def save(self):
+        """Write the cache atomically if anything changed"""
+        if not self._dirty:
+            return
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump({'parser_version': self.parser_version, 'entries': self.entries},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.cache_file)
+        self._dirty = False
@@ -0,0 +1,123 @@
+import collections
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+# Upper bounds (seconds) of the per-file parse latency histogram buckets
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf')]
+
+# Profilers available behind --profile, with the file extension of their output
+PROFILERS = {'cprofile': '.prof', 'pyinstrument': '.html'}
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def cpu_seconds():
+    """CPU time of this process plus its finished children (parse workers)"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class RunReport:
+    """Per-stage wall/CPU time, peak memory and per-file parse latencies of one run"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = []
+        self.files = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one named stage"""
+        wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'stage': name,
+                'wall_s': round(time.perf_counter() - wall_start, 4),
+                'cpu_s': round(cpu_seconds() - cpu_start, 4),
+                'peak_rss_mb': peak_rss_mb(),
+            })
+
+    def record_file(self, file_name, timing, error=None):
+        """Add the parse timing of one workbook ({'wall_s', 'cpu_s', 'read_s', 'parse_s', 'template'})"""
+        self.files.append({'file': file_name, **timing, 'error': error})
+
+    def as_dict(self, slowest=10):
+        latencies = np.array([f['wall_s'] for f in self.files], dtype=float)
+        counts = np.histogram(latencies, bins=[0.0] + LATENCY_BUCKETS)[0] if len(latencies) else []
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_wall_s': round(sum(s['wall_s'] for s in self.stages), 4),
+            'total_cpu_s': round(sum(s['cpu_s'] for s in self.stages), 4),
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_workers_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+            'stages': self.stages,
+            'files_parsed': len(self.files),
+            'parse_latency_s': {
+                'p50': round(float(np.percentile(latencies, 50)), 4) if len(latencies) else None,
+                'p95': round(float(np.percentile(latencies, 95)), 4) if len(latencies) else None,
+                'max': round(float(latencies.max()), 4) if len(latencies) else None,
+                'histogram': [{'le': bound, 'count': int(count)}
+                              for bound, count in zip(LATENCY_BUCKETS, counts)],
+            },
+            # Files parsed per workbook template fingerprint
+            'templates': dict(collections.Counter(f['template'] for f in self.files if 'template' in f)),
+            'slowest_files': sorted(self.files, key=lambda f: f['wall_s'], reverse=True)[:slowest],
+        }
+
+    def save(self, report_file, slowest=10):
+        """Write the report as JSON"""
+        report = self.as_dict(slowest)
+        # json cannot encode inf; the last bucket is open-ended
+        for bucket in report['parse_latency_s']['histogram']:
+            if bucket['le'] == float('inf'):
+                bucket['le'] = None
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def print_stages(self):
+        print("\nStage timings (wall / CPU):")
+        for s in self.stages:
+            print(f"   {s['stage']:<18} {s['wall_s']:8.2f}s {s['cpu_s']:8.2f}s")
+
+
+def stage(report, name):
+    """report.stage(name), or a no-op when the caller is not collecting a report"""
+    return report.stage(name) if report is not None else contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def profiled(profiler, output_file):
+    """Run the enclosed block under cProfile or pyinstrument and save its output"""
+    if profiler == 'cprofile':
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output_file)
+    else:
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+    print(f"  ✓ Profile written to {output_file}")
@@ -0,0 +1,51 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE = os.path.join(SCRIPT_DIR, 'merge_with_excel_charts_updated.py')
+
+
+def run_shards(input_dir, count, pipeline_args):
+    """Run the map step as count side-by-side processes, one per shard; returns the partial files"""
+    partial_files = [os.path.join(input_dir, f'merged_data_partial.shard{index}of{count}.pkl')
+                     for index in range(1, count + 1)]
+    start = time.perf_counter()
+    processes = []
+    for index, partial_file in enumerate(partial_files, start=1):
+        command = [sys.executable, PIPELINE, '--input-dir', input_dir, '--shard', f'{index}/{count}',
+                   '--partial-file', partial_file, *pipeline_args]
+        processes.append(subprocess.Popen(command, stdout=subprocess.DEVNULL))
+    for index, process in enumerate(processes, start=1):
+        if process.wait() != 0:
+            sys.exit(f"Shard {index}/{count} failed (exit code {process.returncode})")
+    print(f"  ✓ {count} shards done in {time.perf_counter() - start:.1f}s")
+    return partial_files
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run the merge as a map-reduce on one machine: every shard in its own process (standing in '
+                    'for a node), then --reduce over their partials; unrecognized options are passed on to '
+                    'every pipeline run (e.g. --workers, --data-only)')
+    parser.add_argument('--input-dir', default=SCRIPT_DIR,
+                        help='directory with the participant workbooks (default: the directory of this script)')
+    parser.add_argument('--shards', type=int, default=4, help='number of shard processes (default: 4)')
+    args, pipeline_args = parser.parse_known_args()
+    input_dir = os.path.abspath(args.input_dir)
+
+    print(f"Map: {args.shards} shards of {input_dir}")
+    partial_files = run_shards(input_dir, args.shards, pipeline_args)
+
+    print("Reduce: merging the partials")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, PIPELINE, '--input-dir', input_dir, '--reduce', *partial_files, *pipeline_args],
+                   check=True, stdout=subprocess.DEVNULL)
+    print(f"  ✓ Reduced in {time.perf_counter() - start:.1f}s")
+    print(f"\n✓ Workbook written to {os.path.join(input_dir, 'merged_data_with_charts.xlsx')}")
+
+
+if __name__ == '__main__':
+    main()
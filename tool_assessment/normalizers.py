@@ -0,0 +1,109 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from extraction import question_key
+
+# default value meaning "leave unmatched answers as they are"
+KEEP = object()
+
+NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+class Normalizer:
+    """Maps free-text answers to standard labels through a compiled rule table
+
+    The answer is stripped and lower-cased, then checked against:
+      * exact: {label: [values]} - a dict lookup
+      * keywords: [(label, [substrings])] - the first rule with any substring
+        in the answer wins; all rules are compiled into one regex whose
+        alternation is tried in rule order
+      * numeric: the first number in the answer ('22 years' -> 22)
+    Anything else maps to default (KEEP leaves the answer unchanged). Results
+    are memoized per raw value, and apply() normalizes only the distinct
+    values of a Series.
+    """
+
+    def __init__(self, exact=None, keywords=None, numeric=False, default=KEEP):
+        self.exact = {value: label for label, values in (exact or {}).items() for value in values}
+        self.labels = [label for label, _ in (keywords or [])]
+        self.numeric = numeric
+        self.default = default
+        self.pattern = None
+        if self.labels:
+            # At position 0 each branch looks ahead for one rule's keywords; the
+            # regex engine tries branches left to right, so rule order is kept
+            branches = [f"(?=.*?(?:{'|'.join(re.escape(k) for k in rule_keywords)}))(?P<r{i}>)"
+                        for i, (_, rule_keywords) in enumerate(keywords)]
+            self.pattern = re.compile('|'.join(branches), re.DOTALL)
+        self._cache = {}
+
+    @classmethod
+    def from_rule(cls, rule):
+        """Build a normalizer from one entry of a cleaning rules file"""
+        return cls(exact=rule.get('exact'),
+                   keywords=rule.get('keywords'),
+                   numeric=rule.get('numeric', False),
+                   default=rule.get('default', KEEP))
+
+    def _normalize(self, value):
+        val = str(value).strip().lower()
+        if val in self.exact:
+            return self.exact[val]
+        if self.pattern is not None:
+            rule = self.pattern.match(val)
+            if rule:
+                return self.labels[int(rule.lastgroup[1:])]
+        if self.numeric:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return value
+            number = NUMBER.search(val)
+            if number:
+                text = number.group(0)
+                return float(text) if '.' in text else int(text)
+        return value if self.default is KEEP else self.default
+
+    def __call__(self, value):
+        """Normalize one answer; missing values are returned unchanged"""
+        if pd.isna(value):
+            return value
+        try:
+            return self._cache[value]
+        except KeyError:
+            label = self._cache[value] = self._normalize(value)
+            return label
+
+    def apply(self, series):
+        """Normalize a Series by computing each distinct answer once"""
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        labels = np.empty(len(uniques) + 1, dtype=object)
+        labels[:-1] = [self(value) for value in uniques]
+        labels[-1] = np.nan
+        return pd.Series(labels[codes], index=series.index, name=series.name, dtype=object).infer_objects()
+
+
+def load_cleaning_rules(rules_file):
+    """Compile a cleaning rules file into {question key: (name, Normalizer)}
+
+    The file maps a question - its 'Qn)' prefix, or the full text for questions
+    without a number - to a rule with an optional display name, an 'exact'
+    table, 'keywords' rules, a 'numeric' flag and a 'default' label.
+    """
+    with open(rules_file, encoding='utf-8') as f:
+        rules = json.load(f)
+    return {question_key(question): (rule.get('name', question), Normalizer.from_rule(rule))
+            for question, rule in rules.items()}
+
+
+def apply_cleaning_rules(df, cleaners):
+    """Normalize every column of df that has a rule; returns the cleaned names"""
+    cleaned = []
+    for column in df.columns:
+        rule = cleaners.get(question_key(str(column)))
+        if rule is not None:
+            name, normalizer = rule
+            df[column] = normalizer.apply(df[column])
+            cleaned.append(name)
+    return cleaned
@@ -0,0 +1,127 @@
+import os
+import pickle
+import socket
+import time
+
+import pandas as pd
+
+from extraction import question_key, with_usability_dtypes
+from running_aggregates import SummaryCounts
+from score_stats import score_histogram
+
+
+def shard_files(excel_files, index, count):
+    """Files of shard index (1-based) of count: contiguous blocks of the sorted list,
+    so shards 1..count together are the whole list in order"""
+    return excel_files[(index - 1) * len(excel_files) // count:index * len(excel_files) // count]
+
+
+def shard_path(path, shard):
+    """path with the shard in its name (merged_data_run_report.json -> merged_data_run_report.shard2of4.json)"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.shard{shard[0]}of{shard[1]}{ext}'
+
+
+class PartialAggregate:
+    """Mergeable aggregate of one shard of the participant workbooks
+
+    Holds the shard's SummaryCounts (demographics value counts, response counts
+    and score histograms), its question texts, a manifest of the participants
+    it covers (file, size, mtime) and its cleaned wide tables, which only feed
+    the raw data sheets. The summaries of any number of partials follow from
+    the counts alone. The signature (parser version, summary registry and
+    cleaning rules) must match for partials to be merged.
+    """
+
+    def __init__(self, signature, shard, counts, question_texts, manifest, demographics_wide, usability_wide):
+        self.signature = signature
+        self.shard = shard
+        self.host = socket.gethostname()
+        self.created = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.counts = counts
+        self.question_texts = question_texts
+        self.manifest = manifest
+        self.demographics_wide = demographics_wide
+        self.usability_wide = usability_wide
+
+    @classmethod
+    def from_tables(cls, signature, shard, input_dir, demo_questions, demographics_wide, usability_wide,
+                    question_texts):
+        """Count a shard's cleaned wide tables (as built by the aggregation stage)"""
+        counts = SummaryCounts(demo_questions)
+        counts.participants = len(demographics_wide)
+        for column in demographics_wide.columns[1:]:
+            key = question_key(str(column))
+            counts.demo_labels.setdefault(key, column)
+            if key in counts.demo_counts:
+                counts.demo_counts[key] = demographics_wide[column].dropna().value_counts(sort=False).to_dict()
+
+        questions = [c[:-len('_Score')] for c in usability_wide.columns if c.endswith('_Score')]
+        for question, hist in zip(questions, score_histogram(usability_wide, questions)):
+            counts.score_hist[question] = hist
+            # Count the category codes; value_counts(sort=False) keeps order of first appearance
+            responses = usability_wide[f'{question}_Response']
+            codes = pd.Series(responses.cat.codes.to_numpy())
+            code_counts = codes[codes >= 0].value_counts(sort=False)
+            counts.response_counts[question] = dict(zip(responses.cat.categories[code_counts.index],
+                                                        code_counts.tolist()))
+        counts.usability_columns = dict.fromkeys(usability_wide.columns)
+
+        manifest = []
+        for participant in demographics_wide['Participant']:
+            stat = os.stat(os.path.join(input_dir, f'{participant}.xlsx'))
+            manifest.append({'file': f'{participant}.xlsx', 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+
+        return cls(signature, shard, counts, question_texts, manifest, demographics_wide, usability_wide)
+
+    def save(self, partial_file):
+        """Write the partial atomically"""
+        tmp_file = partial_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, partial_file)
+
+    @classmethod
+    def load(cls, partial_file, signature):
+        """Load a partial; ValueError if it was built by a different parser/configuration"""
+        with open(partial_file, 'rb') as f:
+            partial = pickle.load(f)
+        if not isinstance(partial, cls):
+            raise ValueError(f'{partial_file} is not a partial aggregate')
+        if partial.signature != signature:
+            raise ValueError(f'{partial_file} was built with a different parser version, '
+                             f'summary registry or cleaning rules')
+        return partial
+
+
+def merge_partials(partials, demo_questions):
+    """Merge partials, given in file order, into (counts, demographics_wide, usability_wide, question_texts)
+
+    Counts are added in the order given, so with the shards of one directory
+    in shard order the summaries match a single run over all files. Question
+    texts come from the first partial that has any.
+    """
+    counts = SummaryCounts(demo_questions)
+    seen = {}
+    for partial in partials:
+        counts.merge(partial.counts)
+        shard = f'shard {partial.shard[0]}/{partial.shard[1]} on {partial.host}'
+        for entry in partial.manifest:
+            if entry['file'] in seen:
+                print(f"  Warning: {entry['file']} is in both {seen[entry['file']]} and {shard}")
+            seen.setdefault(entry['file'], shard)
+
+    # Every shard's columns get the label the merged table uses for their question
+    demographics = []
+    for partial in partials:
+        shard_table = partial.demographics_wide.copy()
+        shard_table.columns = ['Participant'] + [counts.demo_labels[question_key(str(column))]
+                                                 for column in shard_table.columns[1:]]
+        demographics.append(shard_table)
+    demographics_wide = pd.concat(demographics, ignore_index=True).reindex(columns=counts.demographics_columns())
+
+    usability_wide = pd.concat([partial.usability_wide for partial in partials], ignore_index=True)
+    usability_wide = with_usability_dtypes(usability_wide.reindex(columns=list(counts.usability_columns)))
+
+    question_texts = next((partial.question_texts for partial in partials if partial.question_texts), {})
+    return counts, demographics_wide, usability_wide, question_texts
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+
+class Quarantine:
+    """On-disk list of workbooks that failed to parse, skipped on later runs
+
+    Entries are keyed by absolute path and remember the file's size and mtime
+    when it failed. A file is skipped only while both are unchanged, so a fixed
+    or replaced workbook is retried automatically; the whole list is dropped
+    when parser_version differs (a parser fix may handle the files now). The
+    list is JSON so it can be read, and edited, by hand.
+    """
+
+    def __init__(self, quarantine_file, parser_version):
+        self.quarantine_file = quarantine_file
+        self.parser_version = parser_version
+        self.entries = {}
+        self.skipped = 0
+        self.added = 0
+        self._dirty = False
+
+        if os.path.exists(quarantine_file):
+            try:
+                with open(quarantine_file, encoding='utf-8') as f:
+                    stored = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"  Ignoring unreadable quarantine list {quarantine_file}: {e}")
+                stored = None
+            if stored and stored.get('parser_version') == parser_version:
+                self.entries = stored['files']
+            elif stored:
+                self._dirty = True
+
+    def get(self, file_path):
+        """The recorded error if file_path is quarantined and unchanged since, else None"""
+        entry = self.entries.get(os.path.abspath(file_path))
+        if entry is None:
+            return None
+        stat = os.stat(file_path)
+        if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            return None
+        self.skipped += 1
+        return entry['error']
+
+    def add(self, file_path, error):
+        """Quarantine file_path with the error it failed with"""
+        stat = os.stat(file_path)
+        self.entries[os.path.abspath(file_path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'error': error,
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self.added += 1
+        self._dirty = True
+
+    def discard(self, file_path):
+        """Release file_path (it parsed successfully)"""
+        if self.entries.pop(os.path.abspath(file_path), None) is not None:
+            self._dirty = True
+
+    def clear(self):
+        """Release every file (they are all parsed again)"""
+        if self.entries:
+            self.entries = {}
+            self._dirty = True
+
+    def prune(self, file_paths):
+        """Forget entries for files that are no longer part of the input"""
+        keep = {os.path.abspath(p) for p in file_paths}
+        for key in [k for k in self.entries if k not in keep]:
+            del self.entries[key]
+            self._dirty = True
+
+    def save(self):
+        """Write the list atomically if anything changed"""
+        if not self._dirty:
+            return
+        tmp_file = self.quarantine_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'parser_version': self.parser_version, 'files': self.entries}, f, indent=2)
+        os.replace(tmp_file, self.quarantine_file)
+        self._dirty = False
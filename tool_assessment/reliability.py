@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from bootstrap import score_matrix
+from spilled_table import SpilledTable
+
+RELIABILITY_COLUMNS = ['Question_Number', 'Question_Text', 'Responses', 'Mean_Score',
+                       'Item_Total_Correlation', 'Alpha_If_Deleted']
+
+
+def item_matrix(usability_wide, questions):
+    """Dense participant x item score matrix with 'Not applicable' (score 0) masked as NaN"""
+    items = score_matrix(usability_wide, questions)
+    items[items == 0] = np.nan
+    return items
+
+
+def item_moments(items):
+    """Pairwise-complete sums of an item matrix: {'n', 'sum_x', 'sum_xx', 'sum_xy', 'complete'}
+
+    For every pair of items (i, j), over the participants who scored both: n
+    counts them, sum_x and sum_xx sum item i and its square, sum_xy sums the
+    products. All come from matrix products of the masked scores. They are
+    plain sums, so the moments of chunks of participants can be added up.
+    """
+    valid = (~np.isnan(items)).astype(float)
+    scores = np.nan_to_num(items)
+    return {
+        'n': valid.T @ valid,
+        'sum_x': scores.T @ valid,
+        'sum_xx': (scores ** 2).T @ valid,
+        'sum_xy': scores.T @ scores,
+        'complete': int(valid.all(axis=1).sum()),
+    }
+
+
+def pairwise_moments(moments):
+    """Pairwise-complete (covariance, correlation) matrices from item_moments
+
+    Each pair uses the participants who scored both items, as DataFrame.cov
+    and DataFrame.corr do.
+    """
+    n, sum_x, sum_xx = moments['n'], moments['sum_x'], moments['sum_xx']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # sum_x[i, j] is the sum of item i over the participants who scored both i and j
+        co_moment = moments['sum_xy'] - sum_x * sum_x.T / n
+        covariance = co_moment / (n - 1)
+        spread = (sum_xx - sum_x ** 2 / n) * (sum_xx - sum_x ** 2 / n).T
+        correlation = co_moment / np.sqrt(spread)
+    return covariance, correlation
+
+
+def reliability_stats(moments):
+    """Cronbach's alpha, corrected item-total correlations and alpha-if-item-deleted
+
+    All three follow from the pairwise-complete item covariance matrix C: the
+    variance of a sum of items is the sum of their block of C, so dropping
+    item j for every j at once is a vector expression rather than a loop of
+    table operations. Returns (alpha, item_total, alpha_if_deleted, correlation).
+    """
+    covariance, correlation = pairwise_moments(moments)
+    k = covariance.shape[0]
+    item_var = np.diag(covariance)
+    total_var = covariance.sum()
+    row_sums = covariance.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        alpha = k / (k - 1) * (1 - item_var.sum() / total_var) if k > 1 else np.nan
+        # Sum of the other items: variance and covariance with item j
+        rest_var = total_var - 2 * row_sums + item_var
+        item_total = (row_sums - item_var) / np.sqrt(item_var * rest_var)
+        alpha_if_deleted = ((k - 1) / (k - 2) * (1 - (item_var.sum() - item_var) / rest_var)
+                            if k > 2 else np.full(k, np.nan))
+    return alpha, item_total, alpha_if_deleted, correlation
+
+
+def reliability_tables(usability_wide, questions, question_texts):
+    """Per-item reliability table, Cronbach's alpha and the item correlation matrix of the usability items
+
+    A SpilledTable is summed up a chunk at a time, so memory does not grow
+    with the participants. Returns {'alpha', 'complete' (participants who
+    scored every item), 'items' (RELIABILITY_COLUMNS), 'correlations' (item x
+    item DataFrame)}.
+    """
+    questions = list(questions)
+    chunks = usability_wide.chunks() if isinstance(usability_wide, SpilledTable) else [usability_wide]
+    moments = item_moments(np.empty((0, len(questions))))
+    for chunk in chunks:
+        for name, value in item_moments(item_matrix(chunk, questions)).items():
+            moments[name] = moments[name] + value
+
+    alpha, item_total, alpha_if_deleted, correlation = reliability_stats(moments)
+    responses = np.diag(moments['n']).astype(np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.diag(moments['sum_x']) / responses
+    return {
+        'alpha': round(float(alpha), 3) if not np.isnan(alpha) else np.nan,
+        'complete': moments['complete'],
+        'items': pd.DataFrame({
+            'Question_Number': questions,
+            'Question_Text': [question_texts.get(q, q) for q in questions],
+            'Responses': responses,
+            'Mean_Score': np.round(means, 2),
+            'Item_Total_Correlation': np.round(item_total, 3),
+            'Alpha_If_Deleted': np.round(alpha_if_deleted, 3),
+        }, columns=RELIABILITY_COLUMNS),
+        'correlations': pd.DataFrame(np.round(correlation, 3), index=questions, columns=questions),
+    }
@@ -0,0 +1,435 @@
+import datetime
+import os
+import pickle
+
+import pandas as pd
+
+from instrumentation import stage
+from spilled_table import SpilledTable
+
+# Same look as the header row pandas' to_excel writes
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+DATETIME_FORMAT = {'num_format': 'yyyy-mm-dd hh:mm:ss'}
+DATE_FORMAT = {'num_format': 'yyyy-mm-dd'}
+
+
+def open_report_writer(output_file, streaming=False):
+    """Create the XlsxWriter-backed ExcelWriter for the merged report
+
+    With streaming=True the workbook runs in xlsxwriter's constant_memory mode:
+    each row is flushed to disk as soon as the next row is started, so sheets
+    must be written top to bottom (write_sheet does that).
+    """
+    engine_kwargs = {'options': {'constant_memory': True}} if streaming else None
+    return pd.ExcelWriter(output_file, engine='xlsxwriter', engine_kwargs=engine_kwargs)
+
+
+def _write_rows(workbook, worksheet, columns, chunks, first_row=0):
+    """Write the header and then the rows of every DataFrame in chunks strictly row by row,
+    leaving missing values blank; returns the row after the last one written"""
+    header_format = workbook.add_format(HEADER_FORMAT)
+    datetime_format = workbook.add_format(DATETIME_FORMAT)
+    date_format = workbook.add_format(DATE_FORMAT)
+
+    for col_idx, column in enumerate(columns):
+        worksheet.write(first_row, col_idx, column, header_format)
+
+    row_idx = first_row
+    rows = (row for chunk in chunks for row in chunk.itertuples(index=False, name=None))
+    for row_idx, row in enumerate(rows, start=first_row + 1):
+        for col_idx, value in enumerate(row):
+            if value is None or value is pd.NaT or value is pd.NA or (isinstance(value, float) and value != value):
+                continue
+            if isinstance(value, datetime.datetime):
+                worksheet.write_datetime(row_idx, col_idx, value, datetime_format)
+            elif isinstance(value, datetime.date):
+                worksheet.write_datetime(row_idx, col_idx, value, date_format)
+            else:
+                worksheet.write(row_idx, col_idx, value)
+    return row_idx + 1
+
+
+def write_sheet(writer, df, sheet_name, streaming=False):
+    """Write a DataFrame or SpilledTable to its own sheet (row by row when streaming)
+
+    A SpilledTable is always written row by row, one chunk in memory at a time.
+    """
+    if isinstance(df, SpilledTable):
+        _write_rows(writer.book, writer.book.add_worksheet(sheet_name), df.columns, df.chunks())
+        return
+    if not streaming:
+        df.to_excel(writer, sheet_name=sheet_name, index=False)
+        return
+    # to_excel fills cells column by column, which constant_memory mode cannot handle
+    worksheet = writer.book.add_worksheet(sheet_name)
+    _write_rows(writer.book, worksheet, df.columns, [df])
+
+
+def write_reliability_sheet(writer, reliability, sheet_name='Usability_Reliability'):
+    """Write the item table, Cronbach's alpha and the item correlation matrix one below the other
+
+    Written row by row, so it works in streaming mode too.
+    """
+    workbook = writer.book
+    worksheet = workbook.add_worksheet(sheet_name)
+    row = _write_rows(workbook, worksheet, reliability['items'].columns, [reliability['items']])
+
+    label_format = workbook.add_format({'bold': True})
+    row += 1
+    worksheet.write(row, 0, "Cronbach's alpha", label_format)
+    if reliability['alpha'] == reliability['alpha']:
+        worksheet.write(row, 1, reliability['alpha'])
+    worksheet.write(row + 1, 0, 'Participants with every item scored', label_format)
+    worksheet.write(row + 1, 1, reliability['complete'])
+
+    # Pairwise-complete correlations: each pair over the participants who scored both items
+    correlations = reliability['correlations'].rename_axis('Question_Number').reset_index()
+    _write_rows(workbook, worksheet, correlations.columns, [correlations], first_row=row + 3)
+
+
+def save_aggregates(aggregates_file, aggregates):
+    """Save the aggregation stage's tables so the report can be rendered later"""
+    tmp_file = aggregates_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(aggregates, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, aggregates_file)
+
+
+def load_aggregates(aggregates_file):
+    """Load tables saved by save_aggregates"""
+    with open(aggregates_file, 'rb') as f:
+        return pickle.load(f)
+
+
+def write_report(output_file, aggregates, streaming=False, charts=True, report=None):
+    """Rendering stage: write the data sheets and, unless charts=False, all chart sheets
+
+    Each step is timed as a stage of report (a RunReport), if given.
+    """
+    # Create a Pandas Excel writer using XlsxWriter as the engine
+    # (streaming keeps only the current row of each sheet in memory)
+    writer = open_report_writer(output_file, streaming=streaming)
+
+    # Write data to sheets
+    with stage(report, 'data_sheets'):
+        write_sheet(writer, aggregates['demographics_wide'], 'Demographics', streaming=streaming)
+        write_sheet(writer, aggregates['usability_wide'], 'Usability', streaming=streaming)
+        write_sheet(writer, aggregates['demographics_summary'], 'Demo_Summary', streaming=streaming)
+        write_sheet(writer, aggregates['usability_summary'], 'Usability_Summary', streaming=streaming)
+        write_sheet(writer, aggregates['usability_medians'], 'Usability_Medians', streaming=streaming)
+        # Aggregates saved before the reliability stage existed have no reliability tables
+        if 'reliability' in aggregates:
+            write_reliability_sheet(writer, aggregates['reliability'])
+
+    if charts:
+        with stage(report, 'charts'):
+            write_charts(writer.book, aggregates['demographics_summary'], aggregates['usability_summary'],
+                         aggregates['usability_medians'], aggregates['question_texts'])
+
+    # Close the Pandas Excel writer and output the Excel file
+    with stage(report, 'write_file'):
+        writer.close()
+
+
+def write_charts(workbook, demographics_summary, usability_summary, usability_medians, question_texts):
+    """Build the chart sheets and their data blocks from the summary tables"""
+    print("Creating charts...")
+
+    # ===== CHART 1: COUNTRY DISTRIBUTION =====
+    chart_sheet = workbook.add_worksheet('Charts_Demographics')
+    chart_sheet.set_column('A:A', 2)
+
+    country_data = demographics_summary[demographics_summary['Short_Name'] == 'Q7) Country']
+    if not country_data.empty:
+        # Write data for country chart
+        chart_sheet.write_row('B2', ['Country', 'Count', 'Percentage'])
+        for i, row in enumerate(country_data.itertuples(), start=3):
+            chart_sheet.write_row(f'B{i}', [row.Response, row.Count, row.Percentage])
+    
+        # Create bar chart
+        chart1 = workbook.add_chart({'type': 'bar'})
+        chart1.add_series({
+            'name': 'Participant Count',
+            'categories': f'=Charts_Demographics!$B$3:$B${3+len(country_data)-1}',
+            'values': f'=Charts_Demographics!$C$3:$C${3+len(country_data)-1}',
+            'data_labels': {'value': True},
+        })
+        chart1.set_title({'name': 'Country Distribution'})
+        chart1.set_x_axis({'name': 'Number of Participants'})
+        chart1.set_y_axis({'name': 'Country'})
+        chart1.set_size({'width': 720, 'height': 480})
+        chart_sheet.insert_chart('B10', chart1)
+        print("  ✓ Country distribution chart")
+
+    # ===== CHART 2: GENDER DISTRIBUTION =====
+    gender_data = demographics_summary[demographics_summary['Short_Name'] == 'Q2) Gender']
+    if not gender_data.empty:
+        # Pie chart
+        chart2 = workbook.add_chart({'type': 'pie'})
+    
+        # Write data
+        start_row = 3 + len(country_data) + 5
+        chart_sheet.write_row(f'B{start_row}', ['Gender', 'Count'])
+        for i, row in enumerate(gender_data.itertuples(), start=start_row+1):
+            chart_sheet.write_row(f'B{i}', [row.Response, row.Count])
+    
+        chart2.add_series({
+            'name': 'Gender Distribution',
+            'categories': f'=Charts_Demographics!$B${start_row+1}:$B${start_row+len(gender_data)}',
+            'values': f'=Charts_Demographics!$C${start_row+1}:$C${start_row+len(gender_data)}',
+            'data_labels': {'percentage': True, 'category': True},
+        })
+        chart2.set_title({'name': 'Gender Distribution'})
+        chart2.set_size({'width': 480, 'height': 400})
+        chart_sheet.insert_chart('J10', chart2)
+        print("  ✓ Gender distribution chart")
+
+    # ===== CHART 3: USED GENAI (YES/NO) =====
+    used_genai_data = demographics_summary[demographics_summary['Short_Name'] == 'Q4) Used GenAI']
+    if not used_genai_data.empty:
+        start_row = start_row + len(gender_data) + 5
+        chart_sheet.write_row(f'B{start_row}', ['Used GenAI', 'Count'])
+        for i, row in enumerate(used_genai_data.itertuples(), start=start_row+1):
+            chart_sheet.write_row(f'B{i}', [row.Response, row.Count])
+    
+        # Pie chart
+        chart3 = workbook.add_chart({'type': 'pie'})
+        chart3.add_series({
+            'name': 'Used GenAI',
+            'categories': f'=Charts_Demographics!$B${start_row+1}:$B${start_row+len(used_genai_data)}',
+            'values': f'=Charts_Demographics!$C${start_row+1}:$C${start_row+len(used_genai_data)}',
+            'data_labels': {'percentage': True, 'category': True},
+        })
+        chart3.set_title({'name': 'Have you ever used GenAI?'})
+        chart3.set_size({'width': 480, 'height': 400})
+        chart_sheet.insert_chart('J35', chart3)
+        print("  ✓ Used GenAI (Yes/No) chart")
+
+    # ===== CHART 4: DEGREE DISTRIBUTION =====
+    degree_data = demographics_summary[demographics_summary['Short_Name'] == 'Q3) Degree']
+    if not degree_data.empty:
+        start_row = start_row + len(used_genai_data) + 5
+        chart_sheet.write_row(f'B{start_row}', ['Degree', 'Count'])
+        for i, row in enumerate(degree_data.itertuples(), start=start_row+1):
+            chart_sheet.write_row(f'B{i}', [row.Response, row.Count])
+    
+        # Bar chart
+        chart4 = workbook.add_chart({'type': 'bar'})
+        chart4.add_series({
+            'name': 'Degree Count',
+            'categories': f'=Charts_Demographics!$B${start_row+1}:$B${start_row+len(degree_data)}',
+            'values': f'=Charts_Demographics!$C${start_row+1}:$C${start_row+len(degree_data)}',
+            'data_labels': {'value': True},
+        })
+        chart4.set_title({'name': 'Most Recent Degree Distribution'})
+        chart4.set_x_axis({'name': 'Number of Participants'})
+        chart4.set_y_axis({'name': 'Degree'})
+        chart4.set_size({'width': 720, 'height': 480})
+        chart_sheet.insert_chart('B60', chart4)
+        print("  ✓ Degree distribution chart")
+
+    # ===== CHART 5: GENAI FREQUENCY =====
+    freq_data = demographics_summary[demographics_summary['Short_Name'] == 'Q5) GenAI Frequency']
+    if not freq_data.empty:
+        start_row = start_row + len(degree_data) + 5
+        chart_sheet.write_row(f'B{start_row}', ['Frequency', 'Count'])
+        for i, row in enumerate(freq_data.itertuples(), start=start_row+1):
+            chart_sheet.write_row(f'B{i}', [row.Response, row.Count])
+    
+        chart5 = workbook.add_chart({'type': 'column'})
+        chart5.add_series({
+            'name': 'Frequency Count',
+            'categories': f'=Charts_Demographics!$B${start_row+1}:$B${start_row+len(freq_data)}',
+            'values': f'=Charts_Demographics!$C${start_row+1}:$C${start_row+len(freq_data)}',
+            'data_labels': {'value': True},
+        })
+        chart5.set_title({'name': 'GenAI Usage Frequency'})
+        chart5.set_x_axis({'name': 'Frequency'})
+        chart5.set_y_axis({'name': 'Number of Participants'})
+        chart5.set_size({'width': 640, 'height': 400})
+        chart_sheet.insert_chart('J60', chart5)
+        print("  ✓ GenAI frequency chart")
+
+    # ===== CHART 6: USABILITY AVERAGE SCORES =====
+    chart_sheet2 = workbook.add_worksheet('Charts_Usability')
+    chart_sheet2.set_column('A:A', 2)
+
+    # Write data (whole rows at a time: in constant_memory mode a finished row cannot be added to)
+    has_ci = 'Median_CI_Low' in usability_medians.columns
+    # Bootstrap confidence intervals as error bar distances below/above the median
+    chart_sheet2.write_row('B2', ['Question', 'Median Score'] + (['CI Below', 'CI Above'] if has_ci else []))
+    for i, row in enumerate(usability_medians.itertuples(), start=3):
+        values = [row.Question_Number, row.Median_Score]
+        if has_ci:
+            below = row.Median_Score - row.Median_CI_Low
+            above = row.Median_CI_High - row.Median_Score
+            values += [None if pd.isna(below) else round(below, 2), None if pd.isna(above) else round(above, 2)]
+        chart_sheet2.write_row(f'B{i}', values)
+
+    chart6 = workbook.add_chart({'type': 'bar'})
+    median_series = {
+        'name': 'Median Score',
+        'categories': f'=Charts_Usability!$B$3:$B${3+len(usability_medians)-1}',
+        'values': f'=Charts_Usability!$C$3:$C${3+len(usability_medians)-1}',
+        'data_labels': {'value': True, 'num_format': '0.00'},
+    }
+    if has_ci:
+        median_series['x_error_bars'] = {
+            'type': 'custom',
+            'minus_values': f'=Charts_Usability!$D$3:$D${3+len(usability_medians)-1}',
+            'plus_values': f'=Charts_Usability!$E$3:$E${3+len(usability_medians)-1}',
+            'end_style': 1,
+        }
+    chart6.add_series(median_series)
+    chart6.set_title({'name': 'Median Usability Scores (Q1-Q18)'})
+    chart6.set_x_axis({'name': 'Median Score (1-5 scale)', 'min': 0, 'max': 5})
+    chart6.set_y_axis({'name': 'Question'})
+    chart6.set_size({'width': 720, 'height': 600})
+    chart_sheet2.insert_chart('B25', chart6)
+    print("  ✓ Usability median scores chart")
+
+    # ===== CHART 7: TOP 5 & BOTTOM 5 =====
+    top5 = usability_medians.nlargest(5, 'Median_Score')
+    bottom5 = usability_medians.nsmallest(5, 'Median_Score')
+
+    # Write top 5
+    start_row = 3 + len(usability_medians) + 5
+    chart_sheet2.write_row(f'B{start_row}', ['Top 5 Questions', 'Score'])
+    for i, row in enumerate(top5.itertuples(), start=start_row+1):
+        chart_sheet2.write_row(f'B{i}', [row.Question_Number, row.Median_Score])
+
+    chart7 = workbook.add_chart({'type': 'bar'})
+    chart7.add_series({
+        'name': 'Top 5 Highest Scores',
+        'categories': f'=Charts_Usability!$B${start_row+1}:$B${start_row+5}',
+        'values': f'=Charts_Usability!$C${start_row+1}:$C${start_row+5}',
+        'data_labels': {'value': True, 'num_format': '0.00'},
+        'fill': {'color': '#2ecc71'},
+    })
+    chart7.set_title({'name': 'Top 5 Highest Rated Questions'})
+    chart7.set_x_axis({'name': 'Median Score', 'min': 0, 'max': 5})
+    chart7.set_size({'width': 600, 'height': 400})
+    chart_sheet2.insert_chart('J2', chart7)
+    print("  ✓ Top 5 questions chart")
+
+    # Write bottom 5
+    start_row = start_row + 10
+    chart_sheet2.write_row(f'B{start_row}', ['Bottom 5 Questions', 'Score'])
+    for i, row in enumerate(bottom5.itertuples(), start=start_row+1):
+        chart_sheet2.write_row(f'B{i}', [row.Question_Number, row.Median_Score])
+
+    chart8 = workbook.add_chart({'type': 'bar'})
+    chart8.add_series({
+        'name': 'Bottom 5 Lowest Scores',
+        'categories': f'=Charts_Usability!$B${start_row+1}:$B${start_row+5}',
+        'values': f'=Charts_Usability!$C${start_row+1}:$C${start_row+5}',
+        'data_labels': {'value': True, 'num_format': '0.00'},
+        'fill': {'color': '#e74c3c'},
+    })
+    chart8.set_title({'name': 'Bottom 5 Lowest Rated Questions'})
+    chart8.set_x_axis({'name': 'Median Score', 'min': 0, 'max': 5})
+    chart8.set_size({'width': 600, 'height': 400})
+    chart_sheet2.insert_chart('J25', chart8)
+    print("  ✓ Bottom 5 questions chart")
+
+    # ===== CHARTS: INDIVIDUAL QUESTIONS Q1-Q18 WITH IN-CHART LEGEND =====
+    chart_sheet3 = workbook.add_worksheet('Charts_Q1-Q6')
+    chart_sheet4 = workbook.add_worksheet('Charts_Q7-Q12')
+    chart_sheet5 = workbook.add_worksheet('Charts_Q13-Q18')
+
+    chart_sheets = {
+        range(1, 7): chart_sheet3,
+        range(7, 13): chart_sheet4,
+        range(13, 19): chart_sheet5
+    }
+
+    # Response labels for creating legend series
+    response_legend = {
+        1: '1 = Strongly Disagree',
+        2: '2 = Disagree',
+        3: '3 = Neutral',
+        4: '4 = Agree',
+        5: '5 = Strongly Agree',
+        6: '6 = Not applicable'
+    }
+
+    for q_range, sheet in chart_sheets.items():
+        data_row = 2
+    
+        for q_num in q_range:
+            q_data = usability_summary[usability_summary['Question_Number'] == f'Q{q_num}']
+        
+            if not q_data.empty:
+                # Response is the shared ordered Categorical (RESPONSE_ORDER first),
+                # so sorting follows the answer scale without re-categorizing
+                q_data_sorted = q_data.sort_values('Response').reset_index(drop=True)
+            
+                # Map responses to numbers for X-axis
+                response_to_number = {
+                    'Strongly Disagree (1)': 1,
+                    'Disagree (2)': 2,
+                    'Neutral (3)': 3,
+                    'Agree (4)': 4,
+                    'Strongly Agree (5)': 5,
+                    'Not applicable': 6,
+                    'Not applicable ': 6
+                }
+            
+                # Write data with legend labels
+                start_row = data_row
+                sheet.write_row(f'B{start_row}', ['Response_Number', 'Legend_Label', 'Count'])
+                for i, row in enumerate(q_data_sorted.itertuples(), start=start_row+1):
+                    resp_num = response_to_number.get(row.Response, 0)
+                    legend_label = response_legend.get(resp_num, str(resp_num))
+                    sheet.write_row(f'B{i}', [resp_num, legend_label, row.Count])
+            
+                # Create chart
+                chart = workbook.add_chart({'type': 'column'})
+            
+                # Add series for each response category with proper legend
+                for i, row in enumerate(q_data_sorted.itertuples()):
+                    resp_num = response_to_number.get(row.Response, 0)
+                    legend_label = response_legend.get(resp_num, str(resp_num))
+                
+                    chart.add_series({
+                        'name': legend_label,
+                        'categories': f'={sheet.name}!$B${start_row+1+i}:$B${start_row+1+i}',
+                        'values': f'={sheet.name}!$D${start_row+1+i}:$D${start_row+1+i}',
+                        'data_labels': {'value': True, 'font': {'name': 'CMU Serif', 'size': 9}},
+                    })
+            
+                # Get full question text
+                question_text = question_texts.get(f'Q{q_num}', f'Question {q_num}')
+            
+                # Set chart formatting
+                chart.set_title({
+                    'name': question_text,
+                    'name_font': {'name': 'CMU Serif', 'size': 10}
+                })
+                chart.set_x_axis({
+                    'name': 'Response',
+                    'name_font': {'name': 'CMU Serif', 'size': 10},
+                    'num_font': {'name': 'CMU Serif', 'size': 9}
+                })
+                chart.set_y_axis({
+                    'name': 'Number of Participants',
+                    'name_font': {'name': 'CMU Serif', 'size': 10},
+                    'num_font': {'name': 'CMU Serif', 'size': 9}
+                })
+                chart.set_legend({
+                    'position': 'bottom',
+                    'font': {'name': 'CMU Serif', 'size': 8}
+                })
+                chart.set_size({'width': 550, 'height': 450})
+            
+                # Position charts in grid (2 columns, 3 rows per sheet)
+                sheet_q_num = q_num - list(q_range)[0]
+                col_offset = sheet_q_num % 2
+                row_offset = (sheet_q_num // 2) * 28
+            
+                col_letter = chr(66 + col_offset * 10)
+                sheet.insert_chart(f'{col_letter}{2 + row_offset}', chart)
+            
+                data_row = start_row + len(q_data_sorted) + 3
+
+    print(f"  ✓ Individual question charts (Q1-Q18, across 3 sheets)")
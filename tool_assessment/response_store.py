@@ -0,0 +1,220 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from extraction import QUESTION_NUMBER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    participant TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    loaded TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS responses (
+    participant TEXT NOT NULL REFERENCES files (participant),
+    sheet TEXT NOT NULL,
+    question_number TEXT,
+    question_text TEXT NOT NULL,
+    raw_answer,
+    cleaned_answer,
+    score INTEGER
+);
+CREATE INDEX IF NOT EXISTS responses_question ON responses (sheet, question_number);
+CREATE INDEX IF NOT EXISTS responses_participant ON responses (participant);
+CREATE TABLE IF NOT EXISTS summary_questions (
+    position INTEGER PRIMARY KEY,
+    question_number TEXT NOT NULL,
+    question TEXT NOT NULL,
+    short_name TEXT NOT NULL
+);
+"""
+
+
+
+def _round_sql(expression, digits):
+    """SQL for np.round(expression, digits): SQLite's ROUND rounds halves away
+    from zero, np.round (rint of the scaled value) rounds them to even"""
+    scaled = f'(({expression}) * {10 ** digits})'
+    return (f'(CASE WHEN {scaled} - CAST({scaled} AS INTEGER) = 0.5 AND CAST({scaled} AS INTEGER) % 2 = 0 '
+            f'THEN CAST({scaled} AS INTEGER) ELSE ROUND({scaled}) END / {float(10 ** digits)})')
+
+
+# The summary sheets as views. Ties are broken by the first file (in file name
+# order) that gave the answer, and question texts come from the first file
+# that has the question, as in the workbook. Percentages are computed and
+# rounded as the summary sheets do.
+PERCENTAGE = _round_sql('COUNT(*) * 1.0 / (SELECT COUNT(*) FROM files) * 100', 1)
+VIEWS = f"""
+DROP VIEW IF EXISTS demo_summary;
+CREATE VIEW demo_summary AS
+SELECT s.question AS Question, s.short_name AS Short_Name, r.cleaned_answer AS Response,
+       COUNT(*) AS Count, {PERCENTAGE} AS Percentage
+FROM summary_questions s
+JOIN responses r ON r.sheet = 'Demographics' AND r.question_number = s.question_number
+JOIN files f ON f.participant = r.participant
+WHERE r.cleaned_answer IS NOT NULL
+GROUP BY s.position, r.cleaned_answer
+ORDER BY s.position, Count DESC, MIN(f.file);
+
+DROP VIEW IF EXISTS usability_question_texts;
+CREATE VIEW usability_question_texts AS
+SELECT question_number, question_text FROM (
+    SELECT r.question_number, r.question_text,
+           ROW_NUMBER() OVER (PARTITION BY r.question_number ORDER BY f.file) AS file_rank
+    FROM responses r JOIN files f ON f.participant = r.participant
+    WHERE r.sheet = 'Usability'
+) WHERE file_rank = 1;
+
+DROP VIEW IF EXISTS usability_summary;
+CREATE VIEW usability_summary AS
+SELECT r.question_number AS Question_Number, t.question_text AS Question_Text, r.raw_answer AS Response,
+       COUNT(*) AS Count, {PERCENTAGE} AS Percentage
+FROM responses r
+JOIN files f ON f.participant = r.participant
+JOIN usability_question_texts t ON t.question_number = r.question_number
+WHERE r.sheet = 'Usability' AND r.raw_answer IS NOT NULL
+GROUP BY r.question_number, r.raw_answer
+ORDER BY CAST(SUBSTR(r.question_number, 2) AS INTEGER), Count DESC, MIN(f.file);
+
+DROP VIEW IF EXISTS usability_medians;
+CREATE VIEW usability_medians AS
+WITH ranked AS (
+    SELECT question_number, score,
+           ROW_NUMBER() OVER (PARTITION BY question_number ORDER BY score) - 1 AS k
+    FROM responses WHERE sheet = 'Usability' AND score IS NOT NULL
+),
+counts AS (
+    SELECT question_number, COUNT(score) AS n, AVG(score) AS mean
+    FROM responses WHERE sheet = 'Usability' GROUP BY question_number
+),
+positions AS (
+    -- Quantiles interpolated between order statistics, like Series.quantile
+    SELECT c.question_number, p.q, (c.n - 1) * p.q AS pos, CAST((c.n - 1) * p.q AS INTEGER) AS lo
+    FROM counts c, (SELECT 0.25 AS q UNION ALL SELECT 0.5 UNION ALL SELECT 0.75) p
+),
+quantiles AS (
+    SELECT p.question_number, p.q,
+           MAX(CASE WHEN r.k = p.lo THEN r.score END)
+           + (p.pos - p.lo) * (MAX(CASE WHEN r.k = p.lo + (p.pos > p.lo) THEN r.score END)
+                               - MAX(CASE WHEN r.k = p.lo THEN r.score END)) AS value
+    FROM positions p LEFT JOIN ranked r ON r.question_number = p.question_number
+    GROUP BY p.question_number, p.q
+)
+SELECT c.question_number AS Question_Number, t.question_text AS Question_Text,
+       {_round_sql('q50.value', 2)} AS Median_Score, c.n AS Responses, {_round_sql('c.mean', 2)} AS Mean_Score,
+       {_round_sql('q25.value', 2)} AS P25_Score, {_round_sql('q75.value', 2)} AS P75_Score
+FROM counts c
+JOIN usability_question_texts t ON t.question_number = c.question_number
+JOIN quantiles q25 ON q25.question_number = c.question_number AND q25.q = 0.25
+JOIN quantiles q50 ON q50.question_number = c.question_number AND q50.q = 0.5
+JOIN quantiles q75 ON q75.question_number = c.question_number AND q75.q = 0.75
+ORDER BY CAST(SUBSTR(c.question_number, 2) AS INTEGER);
+"""
+
+
+def _sql_value(value):
+    """An answer as SQLite can store it: numbers and text as they are, missing as NULL, the rest as text"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class ResponseStore:
+    """SQLite database of every answer in long format, kept up to date file by file
+
+    Table responses has one row per (participant, sheet, question) with the raw
+    and cleaned answer and the score; files lists the workbook each
+    participant's rows came from with its size and mtime, so unchanged files
+    are not rewritten. The Demo_Summary, Usability_Summary and
+    Usability_Medians sheets are the views demo_summary, usability_summary and
+    usability_medians. Everything is rebuilt when the signature (parser
+    version, summary registry and cleaning rules) differs from the stored one.
+    """
+
+    def __init__(self, db_file, signature, cleaners, demo_questions):
+        self.db_file = db_file
+        self.cleaners = cleaners
+        self.upserted = 0
+        self.connection = sqlite3.connect(db_file)
+        self.connection.executescript(SCHEMA)
+
+        with self.connection:
+            stored = self.connection.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+            if stored is None or stored[0] != repr(signature):
+                self.connection.execute('DELETE FROM responses')
+                self.connection.execute('DELETE FROM files')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (repr(signature),))
+            self.connection.execute('DELETE FROM summary_questions')
+            self.connection.executemany(
+                'INSERT INTO summary_questions VALUES (?, ?, ?, ?)',
+                [(position, QUESTION_NUMBER.match(question).group(1), question, short_name)
+                 for position, (question, short_name) in enumerate(demo_questions)
+                 if QUESTION_NUMBER.match(question)])
+            self.connection.executescript(VIEWS)
+
+        self.fingerprints = {participant: (size, mtime_ns) for participant, size, mtime_ns in
+                             self.connection.execute('SELECT participant, size, mtime_ns FROM files')}
+
+    def _rows(self, demo_dict, usability_dict, question_texts):
+        participant = demo_dict['Participant']
+        for question, answer in demo_dict.items():
+            if question == 'Participant' or _sql_value(answer) is None:
+                continue
+            number = QUESTION_NUMBER.match(question)
+            key = number.group(0) if number else question
+            cleaned = self.cleaners[key][1](answer) if key in self.cleaners else answer
+            yield (participant, 'Demographics', number.group(1) if number else None, question,
+                   _sql_value(answer), _sql_value(cleaned), None)
+
+        for column, score in usability_dict.items():
+            if not column.endswith('_Score'):
+                continue
+            q_num = column[:-len('_Score')]
+            response = _sql_value(usability_dict.get(f'{q_num}_Response'))
+            yield (participant, 'Usability', q_num, question_texts.get(q_num, q_num),
+                   response, response, _sql_value(score))
+
+    def upsert(self, file_path, demo_dict, usability_dict, question_texts):
+        """Replace a participant's rows with this file's answers, unless the file is unchanged since"""
+        stat = os.stat(file_path)
+        participant = demo_dict['Participant']
+        if self.fingerprints.get(participant) == (stat.st_size, stat.st_mtime_ns):
+            return
+        with self.connection:
+            self.connection.execute('DELETE FROM responses WHERE participant = ?', (participant,))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                (participant, os.path.basename(file_path), stat.st_size, stat.st_mtime_ns,
+                 time.strftime('%Y-%m-%dT%H:%M:%S')))
+            self.connection.executemany('INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        self._rows(demo_dict, usability_dict, question_texts))
+        self.fingerprints[participant] = (stat.st_size, stat.st_mtime_ns)
+        self.upserted += 1
+
+    def prune(self, participants):
+        """Delete the rows of participants that are no longer part of the input (or failed to parse)"""
+        keep = set(participants)
+        gone = [p for p in self.fingerprints if p not in keep]
+        with self.connection:
+            for participant in gone:
+                self.connection.execute('DELETE FROM responses WHERE participant = ?', (participant,))
+                self.connection.execute('DELETE FROM files WHERE participant = ?', (participant,))
+                del self.fingerprints[participant]
+        return len(gone)
+
+    def query(self, sql, params=()):
+        """Run a query (e.g. 'SELECT * FROM usability_summary') and return it as a DataFrame"""
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def close(self):
+        self.connection.close()
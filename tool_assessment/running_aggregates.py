@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+
+from extraction import (build_demographics_wide, build_usability_wide, ordered_question_keys, question_key,
+                        response_dtype)
+from normalizers import apply_cleaning_rules
+from score_stats import SCORE_VALUES, usability_medians_table
+from spilled_table import SpilledTable
+from summaries import SUMMARY_COLUMNS, USABILITY_SUMMARY_COLUMNS
+
+
+def _ordered_counts(counts):
+    """Count dict items in value_counts order: count descending, ties by first appearance"""
+    return sorted(counts.items(), key=lambda item: -item[1])
+
+
+def _add_counts(counts, more):
+    for value, count in more.items():
+        counts[value] = counts.get(value, 0) + count
+
+
+class SummaryCounts:
+    """The counts behind the summary sheets
+
+    Value counts of the summarized demographics questions (after cleaning,
+    keyed by 'Qn)' prefix), response counts and score histograms per Usability
+    question, the participant count, and what fixes the wide tables' column
+    order: the first wording of every demographics question and the Usability
+    columns in order of first appearance.
+
+    Counts are plain dicts in order of first appearance, so ties come out in
+    the order value_counts() gives them, and the counts of later files can be
+    merged in afterwards without losing that order.
+    """
+
+    def __init__(self, demo_questions):
+        self.demo_questions = demo_questions
+        self.participants = 0
+        self.demo_counts = {question_key(column): {} for column, _ in demo_questions}
+        self.demo_labels = {}
+        self.response_counts = {}
+        self.score_hist = {}
+        self.usability_columns = {}
+
+    def merge(self, other):
+        """Add the counts of other, which covers files that come after this one's"""
+        self.participants += other.participants
+        for key, counts in other.demo_counts.items():
+            _add_counts(self.demo_counts.setdefault(key, {}), counts)
+        for q_num, counts in other.response_counts.items():
+            _add_counts(self.response_counts.setdefault(q_num, {}), counts)
+        for q_num, hist in other.score_hist.items():
+            self.score_hist[q_num] = self.score_hist.get(q_num, 0) + hist
+        for key, label in other.demo_labels.items():
+            self.demo_labels.setdefault(key, label)
+        for column in other.usability_columns:
+            self.usability_columns.setdefault(column, None)
+
+    def count(self, demo_dict, usability_dict, cleaners):
+        """Count one participant's answers (demographics cleaned with cleaners)
+
+        Returns what was counted, as ({demographics key: cleaned answer},
+        {question: (score, response)}).
+        """
+        self.participants += 1
+
+        demo = {}
+        for question, answer in demo_dict.items():
+            if question == 'Participant':
+                continue
+            key = question_key(question)
+            counts = self.demo_counts.get(key)
+            if counts is None:
+                continue
+            if key in cleaners:
+                _, normalizer = cleaners[key]
+                answer = normalizer(answer)
+            if pd.notna(answer):
+                counts[answer] = counts.get(answer, 0) + 1
+                demo[key] = answer
+
+        usability = {}
+        for column, value in usability_dict.items():
+            if not column.endswith('_Score'):
+                continue
+            q_num = column[:-len('_Score')]
+            response = usability_dict.get(f'{q_num}_Response')
+            usability[q_num] = (value, response)
+            hist = self.score_hist.setdefault(q_num, np.zeros(len(SCORE_VALUES), dtype=np.int64))
+            if value is not None and pd.notna(value):
+                hist[int(value)] += 1
+            counts = self.response_counts.setdefault(q_num, {})
+            if response is not None and pd.notna(response):
+                counts[response] = counts.get(response, 0) + 1
+
+        return demo, usability
+
+    def demographics_columns(self):
+        """demographics_wide column labels: Participant, the numbered questions, then the rest"""
+        return ['Participant'] + [self.demo_labels[key] for key in ordered_question_keys(self.demo_labels)]
+
+    # ===== Summary tables =====
+    def demographics_summary(self):
+        """Demo_Summary rows from the value counts"""
+        rows = {column: [] for column in SUMMARY_COLUMNS}
+        for column, short_name in self.demo_questions:
+            for value, count in _ordered_counts(self.demo_counts[question_key(column)]):
+                rows['Question'].append(column)
+                rows['Short_Name'].append(short_name)
+                rows['Response'].append(value)
+                rows['Count'].append(count)
+        rows['Percentage'] = np.round(np.array(rows['Count'], dtype=np.int64) / self.participants * 100, 1)
+        return pd.DataFrame(rows)
+
+    def usability_summary(self, question_texts):
+        """Usability_Summary rows from the response counts"""
+        rows = {column: [] for column in USABILITY_SUMMARY_COLUMNS}
+        for q_num in range(1, 19):
+            question = f'Q{q_num}'
+            if question not in self.score_hist:
+                continue
+            for response, count in _ordered_counts(self.response_counts.get(question, {})):
+                rows['Question_Number'].append(question)
+                rows['Question_Text'].append(question_texts.get(question, question))
+                rows['Response'].append(response)
+                rows['Count'].append(count)
+                rows['Percentage'].append(round(count / self.participants * 100, 1))
+        summary = pd.DataFrame(rows)
+        if len(summary):
+            # Same ordered response dtype as the usability table, which the charts sort by
+            summary['Response'] = summary['Response'].astype(response_dtype(summary['Response']))
+        return summary
+
+    def usability_medians(self, question_texts):
+        """Usability_Medians rows from the score histograms"""
+        questions = [f'Q{q_num}' for q_num in range(1, 19) if f'Q{q_num}' in self.score_hist]
+        return usability_medians_table(self.score_histograms(questions), questions, question_texts)
+
+    def score_histograms(self, questions):
+        """(question x score) histogram matrix of the given questions"""
+        return np.array([self.score_hist[q] for q in questions], dtype=np.int64).reshape(-1, len(SCORE_VALUES))
+
+
+class RunningAggregates(SummaryCounts):
+    """Summaries accumulated one participant at a time, with the wide rows spilled to disk
+
+    Feeds every participant into the running SummaryCounts. Participants are
+    buffered only until chunk_rows of them are collected; the chunk is then
+    cleaned and appended to the on-disk demographics/usability SpilledTables.
+    Memory therefore stays flat however many files there are. Participants
+    must be added in merge order.
+    """
+
+    def __init__(self, chunk_dir, demo_questions, cleaners, chunk_rows=5000):
+        super().__init__(demo_questions)
+        self.cleaners = cleaners
+        self.chunk_rows = chunk_rows
+        self.cleaned = []
+        self.demographics = SpilledTable(chunk_dir, 'demographics')
+        self.usability = SpilledTable(chunk_dir, 'usability')
+        self._demo_buffer = []
+        self._usability_buffer = []
+
+    def add(self, demo_dict, usability_dict):
+        """Count one participant and buffer its rows for the next chunk"""
+        for question in demo_dict:
+            if question != 'Participant':
+                self.demo_labels.setdefault(question_key(question), question)
+        for column in usability_dict:
+            self.usability_columns.setdefault(column, None)
+        self.count(demo_dict, usability_dict, self.cleaners)
+
+        self._demo_buffer.append(demo_dict)
+        self._usability_buffer.append(usability_dict)
+        if len(self._demo_buffer) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Clean the buffered rows and append them to the spilled tables"""
+        if not self._demo_buffer:
+            return
+        demographics = build_demographics_wide(self._demo_buffer)
+        # A chunk may have met a different wording of a question first; label it as the whole run does
+        demographics.columns = ['Participant'] + [self.demo_labels[question_key(str(column))]
+                                                  for column in demographics.columns[1:]]
+        for name in apply_cleaning_rules(demographics, self.cleaners):
+            if name not in self.cleaned:
+                self.cleaned.append(name)
+        self.demographics.append(demographics)
+        self.usability.append(build_usability_wide(self._usability_buffer))
+        self._demo_buffer = []
+        self._usability_buffer = []
+
+    def finish(self):
+        """Spill the last partial chunk and fix the wide tables' column order"""
+        self.flush()
+        self.demographics.set_columns(self.demographics_columns())
+        self.usability.set_columns(self.usability_columns)
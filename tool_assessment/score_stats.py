@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# Scores produced by response_mapping (0 = Not applicable ... 5 = Strongly Agree)
+SCORE_VALUES = np.arange(6)
+
+
+def score_histogram(usability_wide, questions):
+    """(question x score) count matrix built from the Qn_Score columns in one NumPy pass
+
+    Histograms are plain counts, so histograms of different shards or runs can
+    simply be added together before computing statistics.
+    """
+    scores = usability_wide[[f'{q}_Score' for q in questions]].to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(scores)
+    question_idx = np.broadcast_to(np.arange(len(questions)), scores.shape)[valid]
+    cells = question_idx * len(SCORE_VALUES) + scores[valid].astype(np.int64)
+    counts = np.bincount(cells, minlength=len(questions) * len(SCORE_VALUES))
+    return counts.reshape(len(questions), len(SCORE_VALUES))
+
+
+def _order_statistic(hist, k):
+    """k-th smallest score (0-based) of every histogram row"""
+    cumulative = hist.cumsum(axis=1)
+    return SCORE_VALUES[(cumulative > k[:, None]).argmax(axis=1)]
+
+
+def histogram_quantile(hist, q):
+    """Quantile q of every histogram row, interpolated like Series.quantile (NaN if empty)"""
+    hist = np.asarray(hist)
+    n = hist.sum(axis=1)
+    position = np.maximum(n - 1, 0) * q
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    low_value = _order_statistic(hist, lower)
+    high_value = _order_statistic(hist, upper)
+    result = low_value + (position - lower) * (high_value - low_value)
+    return np.where(n > 0, result, np.nan)
+
+
+def histogram_mean(hist):
+    """Mean score of every histogram row (NaN if empty)"""
+    hist = np.asarray(hist)
+    n = hist.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, (hist * SCORE_VALUES).sum(axis=1) / n, np.nan)
+
+
+def usability_medians_table(hist, questions, question_texts):
+    """Usability_Medians rows (median, responses, mean, quartiles) from a score histogram"""
+    hist = np.asarray(hist).reshape(len(questions), len(SCORE_VALUES))
+    return pd.DataFrame({
+        'Question_Number': questions,
+        'Question_Text': [question_texts.get(q, q) for q in questions],
+        'Median_Score': np.round(histogram_quantile(hist, 0.5), 2),
+        'Responses': hist.sum(axis=1),
+        'Mean_Score': np.round(histogram_mean(hist), 2),
+        'P25_Score': np.round(histogram_quantile(hist, 0.25), 2),
+        'P75_Score': np.round(histogram_quantile(hist, 0.75), 2),
+    })
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from extraction import question_key
+from score_stats import SCORE_VALUES, histogram_mean, histogram_quantile
+
+CUBE_KEYS = ['Dimension', 'Segment', 'Question_Number']
+SCORE_COLUMNS = [f'Score_{score}' for score in SCORE_VALUES]
+
+
+def _empty_counts():
+    return pd.DataFrame(columns=CUBE_KEYS + ['Participants'] + SCORE_COLUMNS)
+
+
+def cube_counts(demographics_wide, usability_wide, dimensions):
+    """Score histogram of every (dimension, segment, question) cell, as count rows
+
+    dimensions lists (demographics column, short name) pairs, matched on their
+    'Qn)' prefix; a segment is one (cleaned) answer to that question, as text.
+    The tables are joined on Participant once, and every (participant,
+    dimension, question) triple is counted in a single bincount. Participants
+    is the size of the segment (whether or not its members answered the
+    question). Counts are plain sums, so count rows of different chunks or
+    shards can be concatenated before build_segment_cube. Without participants
+    (e.g. no workbook parsed) there are no rows.
+    """
+    if 'Participant' not in demographics_wide.columns or 'Participant' not in usability_wide.columns:
+        return _empty_counts()
+    columns_by_key = {question_key(str(column)): column for column in demographics_wide.columns}
+    selected = [(columns_by_key[question_key(column)], short_name)
+                for column, short_name in dimensions if question_key(column) in columns_by_key]
+    score_cols = [c for c in usability_wide.columns if str(c).endswith('_Score')]
+    joined = demographics_wide[['Participant'] + [actual for actual, _ in selected]].merge(
+        usability_wide[['Participant'] + score_cols], on='Participant')
+
+    # One segment id per (dimension, answer) across all dimensions
+    segment_ids = np.empty((len(joined), len(selected)), dtype=np.int64)
+    dimension_labels = []
+    segment_labels = []
+    for dim_idx, (actual, short_name) in enumerate(selected):
+        answers = joined[actual].map(lambda v: v if pd.isna(v) else str(v))
+        codes, uniques = pd.factorize(answers, use_na_sentinel=True)
+        segment_ids[:, dim_idx] = np.where(codes >= 0, codes + len(segment_labels), -1)
+        dimension_labels += [short_name] * len(uniques)
+        segment_labels += list(uniques)
+    n_segments = len(segment_labels)
+    n_questions = len(score_cols)
+
+    scores = joined[score_cols].to_numpy(dtype=float, na_value=np.nan)
+    segments = segment_ids[:, :, None]
+    valid = (segments >= 0) & ~np.isnan(scores[:, None, :])
+    cells = ((segments * n_questions + np.arange(n_questions)) * len(SCORE_VALUES)
+             + np.nan_to_num(scores[:, None, :]).astype(np.int64))
+    hist = np.bincount(cells[valid], minlength=n_segments * n_questions * len(SCORE_VALUES))
+    hist = hist.reshape(n_segments * n_questions, len(SCORE_VALUES))
+    sizes = np.bincount(segment_ids[segment_ids >= 0], minlength=n_segments)
+
+    counts = pd.DataFrame({
+        'Dimension': np.repeat(np.array(dimension_labels, dtype=object), n_questions),
+        'Segment': np.repeat(np.array(segment_labels, dtype=object), n_questions),
+        'Question_Number': np.tile(np.array([c[:-len('_Score')] for c in score_cols], dtype=object), n_segments),
+        'Participants': np.repeat(sizes, n_questions),
+    })
+    counts[SCORE_COLUMNS] = hist
+    return counts
+
+
+def build_segment_cube(count_frames):
+    """Sum cube_counts rows into the cube: one row per (Dimension, Segment, Question_Number)
+
+    The result is indexed (and sorted) by those three levels, so any slice is a
+    lookup: cube.loc[('Q2) Gender', 'Female', 'Q3')] for one cell,
+    cube.loc[('Q2) Gender', 'Female')] for a segment, or
+    cube.xs('Q3', level='Question_Number') for one question across segments.
+    Besides the Score_0..Score_5 counts it has Participants (segment size),
+    Responses, Median_Score and Mean_Score.
+    """
+    counts = pd.concat(count_frames, ignore_index=True) if count_frames else _empty_counts()
+    cube = counts.groupby(CUBE_KEYS).sum().astype(np.int64)
+    hist = cube[SCORE_COLUMNS].to_numpy()
+    cube['Responses'] = hist.sum(axis=1)
+    cube['Median_Score'] = np.round(histogram_quantile(hist, 0.5), 2)
+    cube['Mean_Score'] = np.round(histogram_mean(hist), 2)
+    return cube
@@ -0,0 +1,50 @@
+import glob
+import os
+import pickle
+
+
+class SpilledTable:
+    """A wide table kept on disk as a sequence of pickled DataFrame chunks
+
+    Rows are appended a chunk at a time and read back a chunk at a time, so the
+    table never has to fit in memory. Chunks may have different columns; every
+    chunk is read back with the full column list (in the order set by
+    set_columns, else in order of first appearance), missing cells as NaN.
+    The object itself only holds the chunk file names, so it pickles small.
+    """
+
+    def __init__(self, chunk_dir, name):
+        self.chunk_dir = chunk_dir
+        self.name = name
+        self.chunk_files = []
+        self.columns = []
+        self.rows = 0
+
+        # Chunks of an earlier run are stale as soon as a new table is started
+        os.makedirs(chunk_dir, exist_ok=True)
+        for chunk_file in glob.glob(os.path.join(chunk_dir, f'{name}_*.pkl')):
+            os.remove(chunk_file)
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, df):
+        """Write df as the next chunk"""
+        chunk_file = os.path.join(self.chunk_dir, f'{self.name}_{len(self.chunk_files):06d}.pkl')
+        with open(chunk_file, 'wb') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.chunk_files.append(chunk_file)
+        known = set(self.columns)
+        self.columns += [column for column in df.columns if column not in known]
+        self.rows += len(df)
+
+    def set_columns(self, columns):
+        """Fix the column order the chunks are read back in"""
+        self.columns = list(columns)
+
+    def chunks(self):
+        """Yield the chunks in order, each with the full column list"""
+        for chunk_file in self.chunk_files:
+            with open(chunk_file, 'rb') as f:
+                chunk = pickle.load(f)
+            yield chunk.reindex(columns=self.columns)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from extraction import question_key
+
+SUMMARY_COLUMNS = ['Question', 'Short_Name', 'Response', 'Count', 'Percentage']
+USABILITY_SUMMARY_COLUMNS = ['Question_Number', 'Question_Text', 'Response', 'Count', 'Percentage']
+
+
+def summarize_demographics(demographics_wide, questions):
+    """Build Demo_Summary for every (column, short name) in questions in one pass
+
+    The configured columns are melted to long format once and counted with a
+    single groupby. Rows follow the registry order; within a question they are
+    sorted by count, ties in order of first appearance (as value_counts does).
+    Percentages are relative to all participants, answered or not.
+    """
+    # Registry entries are matched on their 'Qn)' prefix, so wording variants still count
+    columns_by_key = {question_key(str(column)): column for column in demographics_wide.columns}
+    selected = [(columns_by_key[question_key(column)], column, short_name)
+                for column, short_name in questions if question_key(column) in columns_by_key]
+    if not selected:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    wide = demographics_wide[[actual for actual, _, _ in selected]]
+    wide.columns = range(len(selected))
+    long = wide.melt(var_name='Question_Idx', value_name='Response').dropna(subset=['Response'])
+
+    counts = (long.groupby(['Question_Idx', 'Response'], sort=False).size()
+              .rename('Count').reset_index())
+    counts = counts.sort_values(['Question_Idx', 'Count'], ascending=[True, False], kind='stable')
+
+    question_idx = counts['Question_Idx'].to_numpy()
+    return pd.DataFrame({
+        'Question': np.array([column for _, column, _ in selected], dtype=object)[question_idx],
+        'Short_Name': np.array([short_name for _, _, short_name in selected], dtype=object)[question_idx],
+        'Response': counts['Response'].to_numpy(),
+        'Count': counts['Count'].to_numpy(),
+        'Percentage': np.round(counts['Count'].to_numpy() / len(demographics_wide) * 100, 1),
+    })
+
+
+def summarize_usability(usability_wide, question_texts):
+    """Build Usability_Summary from the categorical Qn_Response columns
+
+    Counts the integer category codes of each question instead of the response
+    strings. Within a question rows are sorted by count, ties in order of first
+    appearance (as value_counts does); Response keeps the shared ordered dtype.
+    """
+    columns = {column: [] for column in USABILITY_SUMMARY_COLUMNS}
+    dtype = None
+    for q_num in range(1, 19):
+        question = f'Q{q_num}'
+        if f'{question}_Score' not in usability_wide.columns:
+            continue
+        responses = usability_wide[f'{question}_Response']
+        dtype = responses.dtype
+        codes = pd.Series(responses.cat.codes.to_numpy())
+        counts = codes[codes >= 0].value_counts()
+
+        columns['Question_Number'] += [question] * len(counts)
+        columns['Question_Text'] += [question_texts.get(question, question)] * len(counts)
+        columns['Response'] += list(responses.cat.categories[counts.index])
+        columns['Count'] += counts.tolist()
+        columns['Percentage'] += [round(count / len(usability_wide) * 100, 1) for count in counts.tolist()]
+
+    summary = pd.DataFrame(columns)
+    if dtype is not None:
+        summary['Response'] = summary['Response'].astype(dtype)
+    return summary
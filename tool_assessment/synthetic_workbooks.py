@@ -0,0 +1,163 @@
+import argparse
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import xlsxwriter
+
+DEMOGRAPHICS_QUESTIONS = [
+    'Q1) What is your age?',
+    'Q2) What is your gender?',
+    'Q3) What is your most recent degree?  (e.g. BSc in Electrical Engineering)',
+    'Q4) Have you ever used GenerativeAI (GenAI)? (Yes/No)?',
+    "Q5) If you answered 'Yes' to Q4, how often do you use GenAI? (e.g. once a week)",
+    "Q6) If you answered 'Yes' to Q4, how many different GenAI tools have you used to date?",
+    'Q7) Which country you feel most connected to? This may not be the country where you were born',
+]
+
+# Free-text answers in the spellings participants actually use
+AGES = [21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 39, '22 years', 'X', '25 ']
+GENDERS = ['Male', 'Female', 'male', 'female ', 'M', 'F', 'Man', 'Woman', 'Non-binary', 'Prefer not to say']
+DEGREES = ['BSc in Electrical Engineering', 'BSc in Computer Engineering', 'Bsc in Computer Engineering',
+           'BSc in Software Development', 'BEng in Electrical Engineering', 'MSc in Computer Engineering',
+           'BSc Audiovisual Systems Engineering ', 'Bachelor of Science in Electrical Engineering',
+           'B.Sc. in Engineering in Health Technology', 'Diploma in Electrical Engineering']
+YES_NO = ['Yes', 'yes', 'YES ', 'No', 'no']
+FREQUENCIES = ['Every day', 'Multiple times a week', '5-6 times a week', 'Multiple times per day', 'Rarely',
+               'Depends', '4-5 times a week', '3-4 times a week', 'Once a week', '2-3 times a week',
+               'Almost every day', 'daily', 'Few times a month']
+TOOL_COUNTS = [1, 2, 3, 4, 5, 7, 10, 15, 'Two', 'Three or four', '5-ish', 'A lot', '10+',
+               'ChatGPT, Copilot, Claude', 'only ChatGPT', "I don't know"]
+COUNTRIES = ['Denmark', 'Danmark', 'Denmark ', 'Spain', 'Spain ', 'Catalonia', 'Nepal', 'Iceland', 'Italy',
+             'Portugal', 'greece', 'Bangladesh', 'India, Denmark, Nepal', 'Romania', 'Hungary', 'Canada', 'China']
+DEMOGRAPHICS_ANSWERS = [AGES, GENDERS, DEGREES, YES_NO, FREQUENCIES, TOOL_COUNTS, COUNTRIES]
+
+USABILITY_INSTRUCTIONS = ("There are 18 questions. Please select the Answer that best represents your experience "
+                          "using the AI tool, by adding an 'x' inside the brackets, like this: (x) ")
+USABILITY_HEADER = ['Questions and Answers', 'Strongly Agree (5)', 'Agree (4)', 'Neutral (3)', 'Disagree (2)',
+                    'Strongly Disagree (1)', 'Not applicable ',
+                    'IF Not applicable please explain why do you see the question as Not applicable']
+USABILITY_QUESTIONS = [
+    'Q1) The AI tool helped me (the user) understand what the three AI Agents (Preparator, Aggregator, Validator) can do.',
+    'Q2) The AI tool helped me (the user) understand how often the three AI Agents (Preparator, Aggregator, Validator) may make mistakes.  ',
+    'Q3) The AI tool correctly acts or interrupts me (the user) based on my (the user) current task and context. ',
+    'Q4) The AI tool displays information that is relevant to me (the user), given my current task and context.',
+    'Q5) My experience (the user) when using the AI tool matches my expectations, given my social and cultural backgrounds.  ',
+    'Q6) The AI tool’s language and behaviour do not reinforce undesirable and unfair stereotypes and biases. ',
+    'Q7) The AI tool makes it easy for me (the user) to invoke or request its (the AI tool’s) services when needed.',
+    'Q8) The AI tool makes it easy for me (the user) to dismiss or ignore its (the AI tool’s) undesired services. ',
+    'Q9) The AI tool makes it easy for me (the user) to edit, refine, or recover when it (the AI tool) is wrong. ',
+    'Q10) When the AI tool is uncertain about my goals (as a user), it engages in disambiguation or gracefully degrade its ((the AI tool’s) services. ',
+    'Q11) The AI tool enables me (the user) to be given an explanation about why it (the AI tool) behaved in the way it did.',
+    'Q12) The AI tool maintains a short term memory and allows me (the user) to make efficient references to that memory.',
+    'Q13) The AI tool personalizes my experience (as the user) by learning from their (the AI tool’s) actions over time.',
+    'Q14) The AI tool limits disruptive changes when updating and adapting its (the AI tool’s) behaviours.',
+    'Q15) The AI tool enables me (the user) to provide feedback indicating my preferences during regular interactions with it (the AI tool).',
+    'Q16) The AI tool immediately updates or conveys how my (the user) actions will impact its (the AI tool’s) future behaviours.',
+    'Q17) The AI tool allows me (the user) to globally customize what the AI tool monitors and how it behaves.',
+    'Q18) The AI tool informs me (the user) when it (the AI tool) adds or updates its capabilities.',
+]
+EMPTY_MARKS = ['(   )', '(   )', '(  )', '()']
+X_MARKS = ['(x )', '( x )', '(  x )', '( X )', '(x)', 'x']
+# Real workbooks are spreadsheet exports with styled blank cells over A1:Z1000 on both sheets
+PADDED_ROWS = 1000
+PADDED_COLUMNS = 26
+# Answer column weights: Strongly Agree ... Strongly Disagree, Not applicable
+ANSWER_WEIGHTS = [25, 35, 20, 10, 5, 5]
+
+
+def participant_rows(rng):
+    """(demographics answers, usability rows) for one random participant"""
+    answers = [rng.choice(choices) if rng.random() > 0.03 else None for choices in DEMOGRAPHICS_ANSWERS]
+    usability = []
+    for question in USABILITY_QUESTIONS:
+        cells = [rng.choice(EMPTY_MARKS) for _ in range(6)]
+        mark = rng.random()
+        if mark < 0.95:
+            cells[rng.choices(range(6), ANSWER_WEIGHTS)[0]] = rng.choice(X_MARKS)
+        elif mark < 0.98:
+            # Unmarked row where the participant deleted the spaces of one bracket instead
+            cells = ['(   )'] * 6
+            cells[rng.choices(range(6), ANSWER_WEIGHTS)[0]] = '( )'
+        # otherwise left unanswered
+        usability.append([question] + cells)
+    return answers, usability
+
+
+def _pad(workbook, sheet):
+    blank = workbook.add_format({'font_name': 'Arial'})
+    for row in range(PADDED_ROWS):
+        for col in range(PADDED_COLUMNS):
+            sheet.write_blank(row, col, None, blank)
+
+
+def write_participant_workbook(path, rng, padded=False):
+    """Write one synthetic participant workbook in the questionnaire template layout
+
+    Demographics has Question/Answer columns for Q1-Q7; Usability has its header
+    at data row 2 and Q1-Q18 in data rows 3-20, each marked with an 'x' inside
+    one of the '(   )' brackets (a few rows are left blank or use '( )' instead).
+    padded=True also fills A1:Z1000 of both sheets with styled blank cells like
+    the real exports; such files are about 10x slower to read (and to write).
+    """
+    answers, usability = participant_rows(rng)
+    workbook = xlsxwriter.Workbook(path)
+
+    demographics = workbook.add_worksheet('Demographics')
+    sheet = workbook.add_worksheet('Usability')
+    if padded:
+        _pad(workbook, demographics)
+        _pad(workbook, sheet)
+
+    demographics.write_row(0, 0, ['Question', 'Answer'])
+    for row, (question, answer) in enumerate(zip(DEMOGRAPHICS_QUESTIONS, answers), start=1):
+        demographics.write(row, 0, question)
+        if answer is not None:
+            demographics.write(row, 1, answer)
+
+    sheet.write(0, 0, USABILITY_INSTRUCTIONS)
+    sheet.write_row(3, 0, USABILITY_HEADER)
+    for row, cells in enumerate(usability, start=4):
+        sheet.write_row(row, 0, cells)
+    sheet.write(23, 0, 'Any other comments you would like to make?')
+    if rng.random() < 0.2:
+        sheet.write(24, 0, rng.choice(['Nice tool', 'It was slow sometimes.', 'More explanations please']))
+
+    workbook.close()
+
+
+def _write_range(output_dir, start, stop, seed, padded):
+    for index in range(start, stop):
+        # One generator per file, so the output does not depend on the number of workers
+        rng = random.Random(seed * 1_000_003 + index)
+        write_participant_workbook(os.path.join(output_dir, f'participant_{index:06d}.xlsx'), rng, padded)
+    return stop - start
+
+
+def generate_workbooks(output_dir, count, seed=0, workers=1, padded=False):
+    """Write participant_000000.xlsx ... into output_dir; returns the number written"""
+    os.makedirs(output_dir, exist_ok=True)
+    if workers <= 1:
+        return _write_range(output_dir, 0, count, seed, padded)
+    step = max(1, count // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_write_range, output_dir, start, min(start + step, count), seed, padded)
+                   for start in range(0, count, step)]
+        return sum(future.result() for future in futures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic participant workbooks for benchmarking')
+    parser.add_argument('output_dir')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--padded', action='store_true',
+                        help='fill A1:Z1000 with styled blank cells like the real exports (much slower)')
+    args = parser.parse_args()
+    written = generate_workbooks(args.output_dir, args.count, args.seed, args.workers, args.padded)
+    print(f"✓ Wrote {written} workbooks to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
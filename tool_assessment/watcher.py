@@ -0,0 +1,157 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import zipfile
+
+from extraction import is_participant_file
+
+# inotify event bits (linux/inotify.h) for files created, written, renamed or deleted
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event header: wd, mask, cookie, len (the name follows)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifySource:
+    """Directory change notifications from Linux inotify, called through libc"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {directory}')
+        self.loop = None
+
+    def start(self, loop, on_change):
+        self.loop = loop
+        loop.add_reader(self.fd, self._read, on_change)
+
+    def _read(self, on_change):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if name:
+                on_change(name)
+
+    def close(self):
+        if self.loop is not None:
+            self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Directory change notifications from comparing (size, mtime) snapshots"""
+
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self.task = None
+
+    def _snapshot(self):
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if is_participant_file(entry.name):
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    async def _poll(self, on_change):
+        previous = self._snapshot()
+        while True:
+            await asyncio.sleep(self.interval)
+            current = self._snapshot()
+            for name in previous.keys() | current.keys():
+                if previous.get(name) != current.get(name):
+                    on_change(name)
+            previous = current
+
+    def start(self, loop, on_change):
+        self.task = loop.create_task(self._poll(on_change))
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+
+def open_change_source(directory, poll_interval=None):
+    """inotify where available; polling every poll_interval seconds otherwise (or if requested)"""
+    if poll_interval is None:
+        try:
+            return InotifySource(directory)
+        except (OSError, AttributeError) as e:
+            print(f"  inotify unavailable ({e}), polling instead")
+            poll_interval = 1.0
+    return PollingSource(directory, poll_interval)
+
+
+def _fully_written(path):
+    """A workbook is complete once its zip directory is readable (or it was deleted)"""
+    return not os.path.exists(path) or zipfile.is_zipfile(path)
+
+
+async def watch_directory(directory, refresh, settle=2.0, poll_interval=None):
+    """Call refresh(file_names) whenever participant workbooks change in directory
+
+    Events are debounced: a batch is handed over once no workbook has changed
+    for `settle` seconds, and files whose zip structure is still incomplete
+    (a copy in progress) stay pending until their next event. refresh runs in
+    a worker thread, so events keep being collected while it works; changes
+    that arrive meanwhile are handled in the next batch. Runs until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    pending = {}
+    wake = asyncio.Event()
+
+    def on_change(name):
+        if is_participant_file(name):
+            pending[name] = loop.time()
+            wake.set()
+
+    source = open_change_source(directory, poll_interval)
+    source.start(loop, on_change)
+    try:
+        while True:
+            await wake.wait()
+            wake.clear()
+
+            quiet_for = loop.time() - max(pending.values(), default=loop.time())
+            if quiet_for < settle:
+                await asyncio.sleep(settle - quiet_for)
+                wake.set()
+                continue
+
+            ready = sorted(name for name in pending if _fully_written(os.path.join(directory, name)))
+            for name in pending.keys() - set(ready):
+                print(f"  Waiting for {name} to finish writing")
+            for name in ready:
+                del pending[name]
+            if not ready:
+                continue
+
+            print(f"\nChange detected: {', '.join(ready)}")
+            try:
+                await loop.run_in_executor(None, refresh, ready)
+            except Exception as e:
+                print(f"  Error while updating outputs: {e}")
+    finally:
+        source.close()
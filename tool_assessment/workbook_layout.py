@@ -0,0 +1,130 @@
+import hashlib
+import re
+
+QUESTION_CELL = re.compile(r'^(Q\d+)\)')
+COMMENTS_CELL = re.compile(r'^any other comments', re.IGNORECASE)
+
+# Usability rows read to locate the question block (read_excel data rows 0-39, columns 0-6)
+PROBE_ROWS = 40
+PROBE_COLUMNS = 7
+
+# Value-bearing cells and row starts in worksheet XML (with or without a namespace prefix)
+VALUE_TAG = re.compile(rb'<(?:\w+:)?(?:v|is)[\s>]')
+ROW_TAG = re.compile(rb'<(?:\w+:)?row\b([^>]*)>')
+ROW_NUMBER = re.compile(rb'\sr="(\d+)"')
+
+
+class TemplateLayout:
+    """Where a participant workbook keeps its data
+
+    Demographics columns are 0-based; Usability rows are read_excel data rows
+    (sheet row 1 is the header, so data row N is sheet row N + 2).
+    """
+
+    def __init__(self, demo_question_col, demo_answer_col,
+                 usability_header_row, usability_first_row, usability_last_row):
+        self.demo_question_col = demo_question_col
+        self.demo_answer_col = demo_answer_col
+        self.usability_header_row = usability_header_row
+        self.usability_first_row = usability_first_row
+        self.usability_last_row = usability_last_row
+
+    @property
+    def demo_columns(self):
+        """Number of Demographics columns that hold the questions and answers"""
+        return max(self.demo_question_col, self.demo_answer_col) + 1
+
+
+def _is_blank(value):
+    return value is None or value != value or not str(value).strip()
+
+
+def _first_cell_matches(row, pattern):
+    return bool(row) and not _is_blank(row[0]) and pattern.match(str(row[0]).strip()) is not None
+
+
+def _question_block(usability_probe):
+    """(first, last) rows of the Usability question block, or None if no row starts with 'Qn)'
+
+    The block starts at the first row starting with 'Qn)' and ends before the
+    'Any other comments' row or, in templates without one, before the first
+    row with an empty first cell. Rows inside it that are not questions (a
+    mistyped 'Q10.' or a blank line) are skipped when the answers are read, as
+    with the fixed rows 3-20 before; a 'Qn)' typed into the comments below the
+    block is not a question.
+    """
+    first = next((idx for idx, row in enumerate(usability_probe) if _first_cell_matches(row, QUESTION_CELL)), None)
+    if first is None:
+        return None
+    below = range(first + 1, len(usability_probe))
+    end = next((idx for idx in below if _first_cell_matches(usability_probe[idx], COMMENTS_CELL)), None)
+    if end is None:
+        end = next((idx for idx in below if not usability_probe[idx] or _is_blank(usability_probe[idx][0])),
+                   len(usability_probe))
+    return first, end - 1
+
+
+def template_fingerprint(sheet_names, demo_header, usability_probe):
+    """Hash of what tells templates apart: sheet names, the Demographics header,
+    and the Usability header row and question numbers (not the answers)"""
+    block = _question_block(usability_probe)
+    header, questions = (), ()
+    if block is not None:
+        first, last = block
+        header = usability_probe[first - 1] if first > 0 else ()
+        questions = tuple((idx, QUESTION_CELL.match(str(usability_probe[idx][0]).strip()).group(1))
+                          for idx in range(first, last + 1) if _first_cell_matches(usability_probe[idx], QUESTION_CELL))
+    signature = (
+        tuple(sheet_names),
+        tuple((col, v.strip()) for col, v in enumerate(demo_header) if isinstance(v, str)),
+        tuple((col, v.strip()) for col, v in enumerate(header) if isinstance(v, str)),
+        questions,
+    )
+    return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()[:16]
+
+
+def detect_layout(demo_header, usability_probe):
+    """Work out a workbook's layout from its Demographics header and Usability probe rows
+
+    Layouts are detected per file (the probe is read for the answers anyway,
+    so there is nothing to save by caching them per template). The
+    Demographics question column is the 'Question' header (else the first
+    column) and the answer column is 'Answer' (KeyError if there is none,
+    unless the sheet is empty). The Usability questions are the question block
+    (see _question_block); the header is the row above it.
+    """
+    question_col = demo_header.index('Question') if 'Question' in demo_header else 0
+    if 'Answer' in demo_header:
+        answer_col = demo_header.index('Answer')
+    elif not demo_header:
+        answer_col = 1
+    else:
+        raise KeyError('Answer')
+
+    first_row, last_row = _question_block(usability_probe) or (3, 20)
+    return TemplateLayout(question_col, answer_col, max(first_row - 1, 0), first_row, last_row)
+
+
+def last_value_row(sheet):
+    """1-based number of the last row holding any value in a read-only worksheet
+
+    Scans the raw sheet XML for value elements instead of letting openpyxl build
+    every (mostly blank, styled) cell. Returns 0 for a sheet without values and
+    None if the XML cannot be scanned this way (the caller then reads it all).
+    """
+    try:
+        with sheet._get_source() as source:
+            xml = source.read()
+    except (AttributeError, OSError, KeyError):
+        return None
+
+    last_value = None
+    for last_value in VALUE_TAG.finditer(xml):
+        pass
+    if last_value is None:
+        return 0
+    row = None
+    for row in ROW_TAG.finditer(xml, 0, last_value.start()):
+        pass
+    number = ROW_NUMBER.search(row.group(1)) if row is not None else None
+    return int(number.group(1)) if number else None
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from workbook_layout import PROBE_COLUMNS, PROBE_ROWS, detect_layout, last_value_row, template_fingerprint
+
+# Strings that pd.read_excel turns into NaN by default
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null'
+}
+
+
+def convert_cell(value):
+    """Convert a raw openpyxl value the same way pd.read_excel does"""
+    if value is None:
+        return np.nan
+    if isinstance(value, str):
+        return np.nan if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _trim_trailing_empty(rows):
+    """Drop trailing rows without any data (read_excel does the same)"""
+    last = len(rows)
+    while last and all(v is None or v == '' for v in rows[last - 1]):
+        last -= 1
+    return rows[:last]
+
+
+def read_header(sheet):
+    """First row of a sheet (empty if the sheet has no rows)"""
+    row = next(sheet.iter_rows(max_row=1, values_only=True), ())
+    return [convert_cell(v) for v in row]
+
+
+def read_demographics(sheet, layout):
+    """Read the Question/Answer columns of a Demographics sheet at the layout's coordinates
+
+    Only the columns up to the answer column are read, and only down to the
+    last row that holds a value (found without parsing the blank cells below).
+    """
+    last_row = last_value_row(sheet)
+    rows = []
+    if last_row is None or last_row >= 2:
+        rows = sheet.iter_rows(min_row=2, max_row=last_row, max_col=layout.demo_columns, values_only=True)
+    rows = _trim_trailing_empty(list(rows))
+
+    questions = []
+    answers = []
+    for row in rows:
+        questions.append(convert_cell(row[layout.demo_question_col]) if layout.demo_question_col < len(row) else np.nan)
+        answers.append(convert_cell(row[layout.demo_answer_col]) if layout.demo_answer_col < len(row) else np.nan)
+
+    return pd.DataFrame({'Question': questions, 'Answer': answers}, dtype=object)
+
+
+def read_usability(sheet):
+    """Read the top of a Usability sheet (data rows 0-39, columns 0-6), which holds the response block"""
+    # Sheet row 1 is the read_excel header, so data row N is sheet row N + 2
+    rows = sheet.iter_rows(min_row=2, max_row=PROBE_ROWS + 1, max_col=PROBE_COLUMNS, values_only=True)
+    rows = _trim_trailing_empty(list(rows))
+    data = [[convert_cell(v) for v in row] for row in rows]
+    return pd.DataFrame(data, columns=range(PROBE_COLUMNS), dtype=object)
+
+
+def read_participant_workbook(file_path):
+    """Open a participant workbook once and return (df_demo, df_usability, layout, fingerprint)
+
+    The layout is detected from the Demographics header and the top of the
+    Usability sheet; fingerprint identifies the template (sheet names,
+    Demographics header and Usability question block) for the run report.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        demo_sheet = workbook['Demographics']
+        demo_header = read_header(demo_sheet)
+        df_usability = read_usability(workbook['Usability'])
+        probe = df_usability.values.tolist()
+        layout = detect_layout(demo_header, probe)
+        fingerprint = template_fingerprint(workbook.sheetnames, demo_header, probe)
+        df_demo = read_demographics(demo_sheet, layout)
+    finally:
+        workbook.close()
+    return df_demo, df_usability, layout, fingerprint